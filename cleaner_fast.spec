@@ -0,0 +1,76 @@
+# -*- mode: python ; coding: utf-8 -*-
+#
+# Startup-optimised build of the cleaner GUI; cleaner.spec stays the default.
+#
+#     pyinstaller cleaner_fast.spec      ->  dist/cleaner_fast/
+#
+# - onedir: nothing is unpacked to a temp directory on launch;
+# - no UPX: compressed DLLs/.so files are decompressed on every start;
+# - modules the cleaner never uses are left out (XlsxWriter is only needed
+#   by python-pptx to create charts, most PIL image plugins);
+# - cleaner.py only imports cleaner_options at start-up; python-pptx, lxml
+#   and the OCR stack are loaded in the background once the window is up.
+#
+# Measure with: python src/startup_benchmark.py --command dist/cleaner_fast/cleaner
+
+import pkgutil
+
+import PIL
+
+# Picture formats found in decks (python-pptx and the OCR need these)
+KEEP_PIL_PLUGINS = {
+    'BmpImagePlugin', 'GifImagePlugin', 'IcoImagePlugin', 'JpegImagePlugin',
+    'MpoImagePlugin', 'PngImagePlugin', 'TiffImagePlugin', 'WebPImagePlugin',
+    'WmfImagePlugin',
+}
+unused_pil_plugins = ['PIL.' + module.name for module in pkgutil.iter_modules(PIL.__path__)
+                      if module.name.endswith('ImagePlugin') and module.name not in KEEP_PIL_PLUGINS]
+
+a = Analysis(
+    ['src\\cleaner.py'],
+    pathex=['src'],
+    binaries=[],
+    datas=[],
+    # imported lazily, so the analysis would not see them from cleaner.py
+    hiddenimports=['cleaner_core', 'ocr', 'ocr_cache', 'ocr_prefilter', 'ocr_preprocess',
+                   'packer', 'media_dedup', 'selection'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        'xlsxwriter', 'pyinstrument',
+        'PIL.ImageQt', 'PIL.ImageShow', 'PIL.ImageTk',
+        'unittest', 'doctest', 'pydoc', 'pdb', 'lib2to3', 'tkinter.test', 'test',
+        'distutils', 'setuptools', 'pip',
+    ] + unused_pil_plugins,
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='cleaner',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='cleaner_fast',
+)
@@ -0,0 +1,174 @@
+"""
+abbreviations.py
+
+Single-pass abbreviation expansion for speaker notes.
+
+The whole abbreviation table is compiled once into one regular expression.
+The alternatives are laid out as a prefix trie (`p(?:t(?:en?)?)?` for
+`pt`, `pte`, `pten`), so a text is scanned once no matter how many
+entries the table has, and the greedy trie always tries the longest
+abbreviation first.
+
+Matching rules are the ones the cleaner has always used: case-insensitive,
+preceded by whitespace and followed by whitespace, '.', ',' or ';'.
+
+`expand_text_body` applies the expander to a DrawingML `a:txBody` element
+in place: only the `a:t` texts that contain a match are touched, so run
+formatting survives and frames without any match are left alone.
+
+Tables can be loaded from a file, either a JSON object or a text file with
+one `abbreviation<TAB>expansion` (or `abbreviation=expansion`) per line;
+blank lines and lines starting with '#' are ignored.
+"""
+
+import json
+import re
+from functools import lru_cache
+
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+
+BEFORE = r'(?<=\s)'
+AFTER = r'(?=[\s\.,;])'
+
+
+def _trie_pattern(words):
+    """Regex matching any of `words`, longest alternative first."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        optional = '' in node
+        branches = [re.escape(ch) + build(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if optional else body
+
+    return build(trie)
+
+
+class AbbreviationExpander:
+    """Expands a table of abbreviations in one pass over a text."""
+
+    def __init__(self, table):
+        # case-insensitive matching: look expansions up by lower-cased key
+        self.table = {abbr.lower(): full for abbr, full in table.items() if abbr}
+        if self.table:
+            pattern = BEFORE + _trie_pattern(self.table) + AFTER
+            self.regex = re.compile(pattern, re.IGNORECASE)
+        else:
+            self.regex = None
+
+    def _replace(self, match):
+        return self.table[match.group(0).lower()]
+
+    def expand(self, text):
+        """Return `text` with every abbreviation expanded."""
+        if self.regex is None:
+            return text
+        return self.regex.sub(self._replace, text)
+
+    def finditer(self, text):
+        """Yield (start, end, expansion) for every abbreviation in `text`."""
+        if self.regex is None:
+            return
+        for match in self.regex.finditer(text):
+            yield match.start(), match.end(), self._replace(match)
+
+
+def text_segments(txBody):
+    """Split a text body into (a:t element or None, text) segments.
+
+    The concatenated texts equal what python-pptx reports as the frame text:
+    paragraphs are joined with '\n' and line breaks read as '\v'. Segments
+    with no element are separators that cannot be edited.
+    """
+    segments = []
+    for i, p in enumerate(txBody.iterchildren(A_NS + 'p')):
+        if i:
+            segments.append((None, '\n'))
+        for child in p.iterchildren():
+            if child.tag in (A_NS + 'r', A_NS + 'fld'):
+                t = child.find(A_NS + 't')
+                if t is not None:
+                    segments.append((t, t.text or ''))
+            elif child.tag == A_NS + 'br':
+                segments.append((None, '\v'))
+    return segments
+
+
+def frame_text(txBody):
+    """Text of a text body, as python-pptx's `text_frame.text` reports it."""
+    return ''.join(text for _, text in text_segments(txBody))
+
+
+def expand_text_body(expander, txBody):
+    """Expand abbreviations inside the runs of `txBody`, in place.
+
+    Returns the number of expansions made; 0 means nothing was touched.
+    Matches already spelled like their expansion (matching ignores case,
+    so 'PT' matches 'pt' -> 'PT') are not counted. A match that straddles
+    several runs is written into the first of them and removed from the
+    others.
+    """
+    segments = text_segments(txBody)
+    text = ''.join(seg_text for _, seg_text in segments)
+    matches = [(start, end, full) for start, end, full in expander.finditer(text)
+               if text[start:end] != full]
+    if not matches:
+        return 0
+
+    # segment start offsets in the frame text
+    starts = []
+    offset = 0
+    for _, seg_text in segments:
+        starts.append(offset)
+        offset += len(seg_text)
+
+    new_texts = {}
+    # right to left, so earlier offsets inside a segment stay valid
+    for start, end, full in reversed(matches):
+        first = True
+        for (t, seg_text), seg_start in zip(segments, starts):
+            seg_end = seg_start + len(seg_text)
+            if t is None or seg_end <= start or seg_start >= end:
+                continue
+            current = new_texts.get(t, seg_text)
+            lo = max(start, seg_start) - seg_start
+            hi = min(end, seg_end) - seg_start
+            new_texts[t] = current[:lo] + (full if first else '') + current[hi:]
+            first = False
+    for t, new_text in new_texts.items():
+        t.text = new_text
+    return len(matches)
+
+
+def load_table(path):
+    """Load an abbreviation table from a JSON or tab/'=' separated file."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.json'):
+            return dict(json.load(f))
+        table = {}
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            sep = '\t' if '\t' in line else '='
+            abbr, found, full = line.partition(sep)
+            if not found:
+                raise ValueError(f"{path}: expected 'abbreviation{sep}expansion', got {line!r}")
+            table[abbr.strip()] = full.strip()
+        return table
+
+
+@lru_cache(maxsize=None)
+def load_expander(path):
+    """Compiled expander for a table file, built once per process."""
+    return AbbreviationExpander(load_table(path))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+analyse.py
+
+Usage:
+    python analyse.py [--tool cleaner] [--format json|csv] [--workers N]
+                      [--output FILE] [--needs-work FILE] [--slides SPEC]
+                      [--manifest FILE] [inputs ...]
+
+Read-only report of what a cleaning tool would change, for many decks at once:
+1. Collects the decks like batch.py (directories, globs, files, manifest).
+2. Streams each deck's ZIP members on a process pool; nothing is written
+   and no python-pptx Presentation is built. Per deck it records its size,
+   slides, media and theme bytes, duplicate media, and the tool's own
+   counts (the `analyse` function next to each tool):
+       cleaner   abbreviations to expand and the notes shapes holding
+                 them, duplicate shapes, shapes to format, backgrounds,
+                 pictures OCR would look at
+       spc       parts and spc attributes clean_spacing3 would reset
+       spc-xml   the same for clean_spacing2 (a:rPr only)
+       kerning   shapes clean_spacing would reset the kerning of
+3. Writes one JSON object or CSV row per deck, with `needs_work` telling
+   whether the tool would change anything. --needs-work writes the decks
+   that do to a file batch.py takes as --manifest, so the rest is skipped.
+
+The tools take --analyse to print the same report for a single deck.
+"""
+
+import argparse
+import csv
+import importlib
+import io
+import json
+import os
+import sys
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import collect_inputs
+from media_dedup import duplicate_media, is_media
+from pipeline import part_kind
+from selection import add_argument as add_selection_argument
+
+# tool name (as in batch.py) -> module with an `analyse(input, ...)` function
+TOOLS = {
+    'cleaner': 'cleaner_core',
+    'spc': 'clean_spacing3',
+    'spc-xml': 'clean_spacing2',
+    'kerning': 'clean_spacing',
+}
+
+
+def package_stats(path):
+    """Sizes and counts read from the ZIP directory of a deck."""
+    with zipfile.ZipFile(path, 'r') as zin:
+        infos = zin.infolist()
+        media = [info for info in infos if is_media(info.filename)]
+        return {
+            'bytes': os.path.getsize(path),
+            'slides': sum(part_kind(info.filename) == 'slide' for info in infos),
+            'media_parts': len(media),
+            'media_bytes': sum(info.file_size for info in media),
+            'theme_bytes': sum(info.file_size for info in infos
+                               if info.filename.startswith('ppt/theme/')),
+            'duplicate_media': len(duplicate_media(zin)),
+        }
+
+
+def analyse_deck(tool, path, **options):
+    """Report for one deck: package stats plus `tool`'s own analysis.
+
+    `options` go to the tool's analyse function (e.g. `slides`, or
+    `settings` for the cleaner).
+    """
+    module = importlib.import_module(TOOLS[tool])
+    return {'deck': path, **package_stats(path), **module.analyse(path, **options)}
+
+
+def print_analysis(tool, path, **options):
+    print(json.dumps(analyse_deck(tool, path, **options), indent=2))
+
+
+def _analyse_one(tool, path, options):
+    """Worker: never raises; failed decks get an 'error' entry instead."""
+    try:
+        return analyse_deck(tool, path, **options)
+    except Exception:
+        return {'deck': path, 'error': traceback.format_exc().strip().splitlines()[-1]}
+
+
+def analyse_decks(tool, paths, workers=None, **options):
+    """Reports for `paths`, in the same order, analysed in parallel."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_analyse_one, [tool] * len(paths), paths,
+                             [options] * len(paths)))
+
+
+def to_csv(reports):
+    columns = []
+    for report in reports:
+        columns += [key for key in report if key not in columns]
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(reports)
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report what a cleaning tool would change, without writing anything"
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="Deck files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--tool", choices=sorted(TOOLS), default="cleaner",
+                        help="Tool whose changes to report (default: cleaner, default settings)")
+    parser.add_argument("--manifest", help="Text file listing one deck path or pattern per line")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--format", choices=("json", "csv"), default="json", help="Report format")
+    parser.add_argument("--output", "-o", help="Write the report here (default: stdout)")
+    parser.add_argument("--needs-work", metavar="FILE",
+                        help="Write the decks the tool would change to FILE (a batch.py manifest)")
+    add_selection_argument(parser)
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.manifest)
+    if not inputs:
+        parser.error("no input decks found")
+    options = {'slides': args.slides} if args.slides is not None else {}
+    if args.tool == 'cleaner' and args.slides is not None:
+        from cleaner_core import build_settings
+        options = {'settings': build_settings(slides=args.slides)}
+
+    reports = analyse_decks(args.tool, inputs, args.workers, **options)
+    text = to_csv(reports) if args.format == 'csv' else json.dumps(reports, indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+    needed = [r['deck'] for r in reports if r.get('needs_work')]
+    failed = [r for r in reports if 'error' in r]
+    for report in failed:
+        print(f"❌ {report['deck']}: {report['error']}", file=sys.stderr)
+    if args.needs_work:
+        with open(args.needs_work, 'w', encoding='utf-8') as f:
+            f.writelines(path + '\n' for path in needed)
+    print(f"{len(needed)} of {len(reports)} decks need work, {len(failed)} could not be read",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+batch.py
+
+Usage:
+    python batch.py --tool spc [--workers N] [--output-dir DIR]
+                    [--manifest FILE] [inputs ...]
+
+Runs one of the single-deck tools over many decks at once:
+1. Collects the input decks from directories (searched recursively for
+   *.pptx), glob patterns, plain file paths and/or a manifest file with one
+   path per line (blank lines and lines starting with '#' are ignored).
+2. Spreads the decks over a process pool, so interpreter and library start-up
+   is paid once per worker instead of once per deck.
+3. Reports success or failure per deck and keeps going after a corrupt one.
+   When a worker process dies (out of memory, a crash in a C library), the
+   decks it took down with it are run again, so only the deck that killed
+   it fails. The exit code is 1 if any deck failed.
+
+Tools (each one reuses the existing per-deck function):
+    spc       clean_spacing3.process_pptx  (regex spc zeroing, streaming)
+    spc-xml   clean_spacing2.zero_out_spc  (XML spc zeroing)
+    kerning   clean_spacing.clean_spacing  (run kerning reset)
+    cleaner   cleaner_core.clean           (GUI cleaner, default settings)
+"""
+
+import argparse
+import glob
+import importlib
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# tool name -> (module, function, suffix used for --output-dir names)
+TOOLS = {
+    'spc': ('clean_spacing3', 'process_pptx', '.fixed'),
+    'spc-xml': ('clean_spacing2', 'zero_out_spc', '.fixed'),
+    'kerning': ('clean_spacing', 'clean_spacing', '_clean'),
+    'cleaner': ('cleaner_core', 'clean', '_cleaned'),
+}
+
+# Names written by the tools themselves; skipped when scanning directories
+# so a second run does not pick up the previous run's output.
+OUTPUT_SUFFIXES = ('.fixed.pptx', '_clean.pptx', '_cleaned.pptx')
+
+
+def _is_deck(path):
+    name = os.path.basename(path)
+    return (name.lower().endswith('.pptx') and not name.startswith('~$')
+            and not name.lower().endswith(OUTPUT_SUFFIXES))
+
+
+def collect_inputs(patterns, manifest=None):
+    """Expand directories, globs and a manifest file into a list of decks."""
+    patterns = list(patterns)
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    patterns.append(line)
+
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(dirpath, fn)
+                       for dirpath, _, filenames in os.walk(pattern)
+                       for fn in filenames]
+            matches = [m for m in sorted(matches) if _is_deck(m)]
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = [m for m in sorted(glob.glob(pattern, recursive=True))
+                       if os.path.isfile(m)]
+            if not matches:
+                print(f"⚠️  No decks match: {pattern}", file=sys.stderr)
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                found.append(path)
+    return found
+
+
+def output_path_for(tool, input_pptx, output_dir):
+    """Output path inside ``output_dir``, or None to use the tool's default."""
+    if not output_dir:
+        return None
+    suffix = TOOLS[tool][2]
+    base, ext = os.path.splitext(os.path.basename(input_pptx))
+    return os.path.join(output_dir, f"{base}{suffix}{ext}")
+
+
+def run_one(tool, input_pptx, output_pptx):
+    """Unit of work executed in a worker process.
+
+    Never raises: returns ``(input, output, error, seconds)`` where ``error``
+    is None on success or the formatted traceback on failure.
+    """
+    module_name, func_name, _ = TOOLS[tool]
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        func = getattr(module, func_name)
+        if output_pptx is None:
+            written = func(input_pptx)
+        else:
+            written = func(input_pptx, output_pptx)
+        return input_pptx, written, None, time.perf_counter() - start
+    except Exception:
+        return input_pptx, None, traceback.format_exc(), time.perf_counter() - start
+
+
+def _report(result):
+    input_pptx, written, error, seconds = result
+    if error is None:
+        print(f"✅ {input_pptx} -> {written} ({seconds:.2f}s)")
+    else:
+        last_line = error.strip().splitlines()[-1]
+        print(f"❌ {input_pptx}: {last_line}", file=sys.stderr)
+
+
+def _run_pool(tool, inputs, workers, output_dir, results):
+    """Run `inputs` on one pool; returns the decks lost when a worker died."""
+    lost = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_one, tool, path, output_path_for(tool, path, output_dir)): path
+                   for path in inputs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # once a worker dies every deck left in the pool fails too
+                lost.append((futures[future], e))
+                continue
+            _report(result)
+            results.append(result)
+    return lost
+
+
+def run_batch(tool, inputs, workers=None, output_dir=None):
+    """Process ``inputs`` with ``tool`` on a pool; returns the list of results.
+
+    Decks lost because a worker process died are run again on a fresh pool;
+    those lost a second time run one per process, so only the deck that
+    kills its worker is reported as failed.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    results = []
+    lost = _run_pool(tool, inputs, workers, output_dir, results)
+    if lost:
+        print(f"⚠️  A worker process died; running {len(lost)} decks again", file=sys.stderr)
+        lost = _run_pool(tool, [path for path, _ in lost], workers, output_dir, results)
+    for path, _ in lost:
+        for _, error in _run_pool(tool, [path], 1, output_dir, results):
+            result = (path, None, f"Worker process died: {error!r}", None)
+            _report(result)
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a PPTX cleaning tool over many decks in parallel"
+    )
+    parser.add_argument(
+        "inputs", nargs="*",
+        help="Deck files, directories (searched recursively) or glob patterns"
+    )
+    parser.add_argument(
+        "--tool", choices=sorted(TOOLS), default="spc",
+        help="Per-deck tool to run (default: spc)"
+    )
+    parser.add_argument(
+        "--manifest", help="Text file listing one deck path or pattern per line"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of worker processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Write results here instead of next to each input"
+    )
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.manifest)
+    if not inputs:
+        parser.error("no input decks found")
+
+    start = time.perf_counter()
+    results = run_batch(args.tool, inputs, args.workers, args.output_dir)
+    failed = [r for r in results if r[2] is not None]
+    print(f"Processed {len(results)} decks in {time.perf_counter() - start:.1f}s: "
+          f"{len(results) - len(failed)} succeeded, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Usage:
+    python benchmark.py [--decks small,text,images] [--tools ...] [--repeat N]
+                        [--output results.json]
+    python benchmark.py --compare before.json after.json
+
+Benchmarks the cleaner and the spc tools on synthetic decks
+(synthetic_deck.py):
+1. Generates each deck profile once into a work directory.
+2. Runs every tool/settings variant on every deck in a fresh Python process
+   per repetition, so start-up and peak memory are measured per run.
+3. Records wall time, CPU time, peak RSS and output size, and writes
+   everything as JSON that can be compared between commits with --compare.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# profile name -> synthetic_deck.generate_deck keyword arguments
+DECKS = {
+    'small': dict(slides=20),
+    'text': dict(slides=200, textboxes=6, paragraphs=4, runs=8, notes_words=200, images=0),
+    'images': dict(slides=50, images=4, image_size=(1920, 1080), notes_words=20),
+}
+
+# tool name -> description; see run_tool for what each one calls
+TOOLS = {
+    'cleaner': "cleaner_core.clean, default settings",
+    'cleaner-font': "cleaner_core.clean, custom font and spacing",
+    'cleaner-ocr': "cleaner_core.clean with OCR (needs Tesseract)",
+    'spc': "clean_spacing3.process_pptx",
+    'spc-xml': "clean_spacing2.zero_out_spc",
+    'kerning': "clean_spacing.clean_spacing",
+}
+
+
+def run_tool(tool, input_pptx, output_pptx):
+    """Run one tool in this process (the child side of a measurement)."""
+    sys.path.insert(0, HERE)
+    if tool.startswith('cleaner'):
+        from cleaner_core import build_settings, clean
+        if tool == 'cleaner-font':
+            settings = build_settings(custom_font='Arial', custom_font_size='20', text_spacing='Tight',
+                                      format_runs=True)
+        elif tool == 'cleaner-ocr':
+            settings = build_settings(enable_ocr=True, ocr_cache=False)
+        else:
+            settings = build_settings()
+        clean(input_pptx, output_pptx, settings)
+    elif tool == 'spc':
+        from clean_spacing3 import process_pptx
+        process_pptx(input_pptx, output_pptx)
+    elif tool == 'spc-xml':
+        from clean_spacing2 import zero_out_spc
+        zero_out_spc(input_pptx, output_pptx)
+    elif tool == 'kerning':
+        from clean_spacing import clean_spacing
+        clean_spacing(input_pptx, output_pptx)
+    else:
+        raise ValueError(f"unknown tool {tool!r}")
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None if unknown."""
+    # Linux keeps ru_maxrss across exec, so a child would report the peak of
+    # the benchmark process itself; VmHWM starts afresh with the new image.
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def child_main(tool, input_pptx, output_pptx):
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_tool(tool, input_pptx, output_pptx)
+    result = {
+        'wall_s': time.perf_counter() - start_wall,
+        'cpu_s': time.process_time() - start_cpu,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+    print(json.dumps(result))
+
+
+def measure(tool, input_pptx, output_pptx):
+    """Run `tool` in a fresh interpreter; returns the child's measurements."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', tool, input_pptx, output_pptx],
+        capture_output=True, text=True)
+    process_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['process_s'] = process_s
+    result['output_bytes'] = os.path.getsize(output_pptx)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(decks, tools, repeat, workdir):
+    sys.path.insert(0, HERE)
+    from synthetic_deck import generate_deck
+
+    results = []
+    for deck in decks:
+        deck_path = os.path.join(workdir, f"{deck}.pptx")
+        if not os.path.exists(deck_path):
+            print(f"Generating {deck} deck...", file=sys.stderr)
+            generate_deck(deck_path, **DECKS[deck])
+        for tool in tools:
+            output_path = os.path.join(workdir, f"{deck}.{tool}.out.pptx")
+            runs = []
+            try:
+                for _ in range(repeat):
+                    runs.append(measure(tool, deck_path, output_path))
+            except RuntimeError as e:
+                print(f"❌ {deck} / {tool}: {e}", file=sys.stderr)
+                continue
+            entry = {
+                'deck': deck,
+                'tool': tool,
+                'input_bytes': os.path.getsize(deck_path),
+                'output_bytes': runs[-1]['output_bytes'],
+                'wall_s': [r['wall_s'] for r in runs],
+                'wall_s_median': statistics.median(r['wall_s'] for r in runs),
+                'cpu_s_median': statistics.median(r['cpu_s'] for r in runs),
+                'process_s_median': statistics.median(r['process_s'] for r in runs),
+                'peak_rss_kb': max((r['peak_rss_kb'] or 0) for r in runs) or None,
+            }
+            print(f"{deck:>8} {tool:>13}: {entry['wall_s_median']:.3f}s "
+                  f"rss={entry['peak_rss_kb']}KiB out={entry['output_bytes']}B", file=sys.stderr)
+            results.append(entry)
+    return results
+
+
+def compare(before_path, after_path):
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = {(e['deck'], e['tool']): e for e in json.load(f)['results']}
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)['results']
+    print(f"{'deck':>8} {'tool':>13} {'wall':>16} {'peak rss':>20} {'output':>22}")
+    for entry in after:
+        old = before.get((entry['deck'], entry['tool']))
+        if old is None:
+            continue
+
+        def delta(key, fmt):
+            a, b = old[key], entry[key]
+            if not a or b is None:
+                return f"{b}"
+            return f"{b:{fmt}} ({(b - a) / a:+.1%})"
+
+        print(f"{entry['deck']:>8} {entry['tool']:>13} {delta('wall_s_median', '.3f'):>16} "
+              f"{delta('peak_rss_kb', 'd'):>20} {delta('output_bytes', 'd'):>22}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PPTX cleaning tools")
+    parser.add_argument("--decks", default=','.join(DECKS),
+                        help=f"Comma separated deck profiles (default: all of {', '.join(DECKS)})")
+    parser.add_argument("--tools", default=None,
+                        help=f"Comma separated tools (default: all of {', '.join(TOOLS)}; "
+                             "cleaner-ocr only when Tesseract is installed)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per deck and tool")
+    parser.add_argument("--workdir", help="Where decks and outputs go (default: a temp dir)")
+    parser.add_argument("--output", "-o", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child_main(*args.child)
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    decks = [d for d in args.decks.split(',') if d]
+    if args.tools:
+        tools = [t for t in args.tools.split(',') if t]
+    else:
+        tools = [t for t in TOOLS if t != 'cleaner-ocr' or shutil.which('tesseract')]
+    for name, known in (('deck', DECKS), ('tool', TOOLS)):
+        unknown = [v for v in (decks if name == 'deck' else tools) if v not in known]
+        if unknown:
+            parser.error(f"unknown {name}(s): {', '.join(unknown)}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pptx_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = run_benchmarks(decks, tools, args.repeat, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'decks': {name: {k: list(v) if isinstance(v, tuple) else v for k, v in DECKS[name].items()}
+                  for name in decks},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,29 +2,27 @@
 import os
 import argparse
 
-from pptx import Presentation
-from pptx.util import Pt
+from instrument import add_arguments as add_instrument_arguments, count, instrumented
+from pipeline import run_pipeline, scan_pipeline
+from rules import KerningRule
+from selection import add_argument as add_selection_argument
 
-def clean_spacing(pptx_path):
-    prs = Presentation(pptx_path)
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if not shape.has_text_frame:
-                continue
-            text_frame = shape.text_frame
-            for paragraph in text_frame.paragraphs:
-                # Clear paragraph spacing
-                # paragraph.space_before = Pt(0)
-                # paragraph.space_after  = Pt(0)
-                # paragraph.line_spacing = Pt(0)
-                # Clear run-level character spacing (kerning)
-                for run in paragraph.runs:
-                    run.font.kerning = Pt(0)
-    # Save with _clean suffix
-    base, ext = os.path.splitext(pptx_path)
-    out_path = f"{base}_clean{ext}"
-    prs.save(out_path)
+def clean_spacing(pptx_path, out_path=None, slides=None):
+    # Save with _clean suffix unless told otherwise
+    if out_path is None:
+        base, ext = os.path.splitext(pptx_path)
+        out_path = f"{base}_clean{ext}"
+    # Clear run-level character spacing (kerning) in one pass over the slides
+    # (only the selected ones, e.g. slides="40-60", when given)
+    run_pipeline(pptx_path, out_path, [KerningRule()], selection=slides)
+    count('bytes_written', os.path.getsize(out_path))
     print(f"Saved cleaned presentation as: {out_path}")
+    return out_path
+
+def analyse(pptx_path, slides=None):
+    # Count the shapes clean_spacing would change, without writing anything
+    changes = scan_pipeline(pptx_path, [KerningRule()], selection=slides)
+    return {'kerned_shapes': changes['KerningRule'], 'needs_work': changes['KerningRule'] > 0}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -33,5 +31,14 @@ if __name__ == "__main__":
     parser.add_argument(
         "pptx_file", help="Path to the source .pptx file"
     )
+    add_selection_argument(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument("--analyse", action="store_true",
+                        help="Only report what would change, as JSON; writes nothing")
     args = parser.parse_args()
-    clean_spacing(args.pptx_file)
+    if args.analyse:
+        from analyse import print_analysis
+        print_analysis('kerning', args.pptx_file, slides=args.slides)
+        raise SystemExit(0)
+    with instrumented(args.report, args.profile, tool='clean_spacing', input=args.pptx_file):
+        clean_spacing(args.pptx_file, slides=args.slides)
@@ -3,76 +3,173 @@
 zero_spc.py
 
 Usage:
-    python zero_spc.py input.pptx [output.pptx]
+    python zero_spc.py input.pptx [output.pptx] [--slides SPEC] [--pack] [--dpi N]
 
 This script:
-1. Unzips the input PPTX into a temporary folder.
-2. Finds every XML file under 'ppt/'.
-3. Parses each XML, sets all a:rPr/@spc to "0".
-4. Writes the modified XML back.
-5. Re-zips everything into output.pptx (or overwrites input if not specified).
+1. Streams the input PPTX member by member into output.pptx
+   (or input.pptx.fixed.pptx if not specified); nothing is unzipped to disk.
+2. Finds every XML file under 'ppt/' with an a:rPr whose spc attribute is
+   not "0" (only among the selected slides, notes or masters with
+   --slides, see selection.py).
+3. Rewrites those with a streaming XML parser, setting all a:rPr/@spc to
+   "0". Memory use stays the same however large a part is, and namespace
+   prefixes, the XML declaration and whitespace are kept as they are.
+4. Copies every other member as raw compressed bytes.
+5. With --pack, repacks the output with packer.py (media stored, XML
+   deflated in parallel, optionally pictures downsampled to --dpi).
 """
 
-import sys
+import argparse
 import os
-import zipfile
-import shutil
+import re
 import tempfile
-import xml.etree.ElementTree as ET
-
-# Register the 'a' namespace so it appears nicely in output
-ET.register_namespace('a', 'http://schemas.openxmlformats.org/drawingml/2006/main')
-
-def fix_spacing_in_xml_file(xml_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-    # namespace map
-    ns = {'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
-    # find all <a:rPr> elements
-    # for rPr in root.findall('.//a:rPr', ns):
-    #     # if they have a 'spc' attribute, set it to "0"
-    #     if 'spc' in rPr.attrib:
-    #         rPr.attrib['spc'] = '0'
-    # write back
-    tree.write(xml_path, xml_declaration=True, encoding='UTF-8')
-
-def zero_out_spc(input_pptx, output_pptx=None):
+import zipfile
+
+from instrument import add_arguments as add_instrument_arguments, count, instrumented, stage
+from selection import add_argument as add_selection_argument, selected_names
+from xmlstream import CHUNK_SIZE, rewrite_stream, set_existing_attributes
+from zipstream import copy_member, open_member
+
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+
+# Run attributes to reset on a:rPr, when present
+DEFAULT_ATTRIBUTES = {'spc': '0'}
+
+
+def attributes_pattern(attributes):
+    """Bytes regex finding an rPr start tag with any of `attributes` set to another value.
+
+    Only rPr elements are rewritten, so a part whose other elements carry
+    such an attribute (a:pPr, ...) is left alone and raw-copied. The whole
+    attribute value has to be in the match, so one cut off at the end of a
+    chunk does not count.
+    """
+    alternatives = b'|'.join(
+        re.escape(name.encode()) + b'="(?!' + re.escape(value.encode()) + b'")[^"]*"'
+        for name, value in attributes.items())
+    return re.compile(rb'<(?:[\w.-]+:)?rPr\b[^>]*?\s(?:' + alternatives + rb')')
+
+
+def _carry(buffer):
+    """The end of `buffer` from its last '<': a tag the next chunk may complete."""
+    start = buffer.rfind(b'<')
+    return buffer[start:] if start >= 0 else buffer
+
+
+def needs_rewrite(source, pattern):
+    """Scan a stream for `pattern` without reading it into memory at once."""
+    tail = b''
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return False
+        buffer = tail + chunk
+        if pattern.search(buffer):
+            return True
+        tail = _carry(buffer)
+
+
+def count_matches(source, pattern):
+    """Number of `pattern` matches in a stream, read chunk by chunk."""
+    found = 0
+    tail = b''
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return found
+        buffer = tail + chunk
+        # matches ending inside the tail were counted with the previous chunk
+        found += sum(1 for m in pattern.finditer(buffer) if m.end() > len(tail))
+        tail = _carry(buffer)
+
+
+def is_spacing_part(info):
+    name = info.filename
+    return name.startswith('ppt/') and name.lower().endswith('.xml')
+
+
+def fix_spacing_in_xml_file(xml_path, attributes=None):
+    """Rewrite one extracted XML file in place; returns the number of a:rPr changed."""
+    rewriter = set_existing_attributes(A_NS, ('rPr',), attributes or DEFAULT_ATTRIBUTES)
+    fd, tmp_path = tempfile.mkstemp(suffix='.xml', dir=os.path.dirname(xml_path) or '.')
+    try:
+        with open(xml_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            changed = rewrite_stream(src, dst.write, rewriter)
+        os.replace(tmp_path, xml_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return changed
+
+
+def zero_out_spc(input_pptx, output_pptx=None, attributes=None, pack=False, target_dpi=None,
+                 slides=None):
     if output_pptx is None:
-        # overwrite input
+        # keep the input, write next to it
         output_pptx = input_pptx + '.fixed.pptx'
-    # make a temp dir
-    tmpdir = tempfile.mkdtemp(prefix="pptx_unzip_")
-    try:
-        # unzip all files
-        with zipfile.ZipFile(input_pptx, 'r') as zin:
-            zin.extractall(tmpdir)
-
-        # walk through ppt/ subfolder
-        ppt_folder = os.path.join(tmpdir, 'ppt')
-        for dirpath, _, filenames in os.walk(ppt_folder):
-            for fn in filenames:
-                if fn.lower().endswith('.xml'):
-                    full = os.path.join(dirpath, fn)
-                    fix_spacing_in_xml_file(full)
-
-        # rezip into output
-        with zipfile.ZipFile(output_pptx, 'w', zipfile.ZIP_DEFLATED) as zout:
-            # maintain folder structure
-            for dirpath, dirnames, filenames in os.walk(tmpdir):
-                for fn in filenames:
-                    full = os.path.join(dirpath, fn)
-                    # archive name should be relative to tmpdir
-                    arcname = os.path.relpath(full, tmpdir)
-                    zout.write(full, arcname)
-        print(f"✅ Written fixed PPTX to: {output_pptx}")
-    finally:
-        # clean up
-        shutil.rmtree(tmpdir)
+    attributes = attributes or DEFAULT_ATTRIBUTES
+    pattern = attributes_pattern(attributes)
+    rewriter = set_existing_attributes(A_NS, ('rPr',), attributes)
+
+    parts = runs = 0
+    with zipfile.ZipFile(input_pptx, 'r') as zin, \
+            zipfile.ZipFile(output_pptx, 'w') as zout:
+        selected = selected_names(zin, slides)
+        for info in zin.infolist():
+            if is_spacing_part(info) and (selected is None or info.filename in selected):
+                with stage('scan'), zin.open(info) as source:
+                    rewrite = needs_rewrite(source, pattern)
+                count('parts_scanned')
+                if rewrite:
+                    with stage('rewrite'), zin.open(info) as source, open_member(zout, info) as dest:
+                        runs += rewrite_stream(source, dest.write, rewriter)
+                    parts += 1
+                    continue
+            with stage('copy'):
+                copy_member(zin, zout, info)
+    count('parts_rewritten', parts)
+    count('runs_touched', runs)
+    count('bytes_read', os.path.getsize(input_pptx))
+    if pack or target_dpi:
+        from packer import pack_pptx, print_pack_stats
+        with stage('pack'):
+            print_pack_stats(pack_pptx(output_pptx, target_dpi=target_dpi))
+    count('bytes_written', os.path.getsize(output_pptx))
+    print(f"✅ Written fixed PPTX to: {output_pptx} ({runs} runs in {parts} parts reset)")
+    return output_pptx
+
+
+def analyse(input_pptx, attributes=None, slides=None):
+    """Parts and attributes zero_out_spc would reset; writes nothing."""
+    pattern = attributes_pattern(attributes or DEFAULT_ATTRIBUTES)
+    parts = found = 0
+    with zipfile.ZipFile(input_pptx, 'r') as zin:
+        selected = selected_names(zin, slides)
+        for info in zin.infolist():
+            if is_spacing_part(info) and (selected is None or info.filename in selected):
+                with zin.open(info) as source:
+                    matches = count_matches(source, pattern)
+                if matches:
+                    parts += 1
+                    found += matches
+    return {'parts_to_rewrite': parts, 'spc_attributes': found, 'needs_work': parts > 0}
+
 
 if __name__ == '__main__':
-    if not (2 <= len(sys.argv) <= 3):
-        print(__doc__)
-        sys.exit(1)
-    inp = sys.argv[1]
-    outp = sys.argv[2] if len(sys.argv) == 3 else None
-    zero_out_spc(inp, outp)
+    parser = argparse.ArgumentParser(description="Set a:rPr/@spc to 0 throughout a PPTX")
+    parser.add_argument("input", help="Path to the source .pptx file")
+    parser.add_argument("output", nargs="?", help="Output path (default: <input>.fixed.pptx)")
+    parser.add_argument("--pack", action="store_true", help="Repack the output (see packer.py)")
+    parser.add_argument("--dpi", type=int, help="With --pack, downsample pictures above this DPI")
+    add_selection_argument(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument("--analyse", action="store_true",
+                        help="Only report what would change, as JSON; writes nothing")
+    args = parser.parse_args()
+    if args.analyse:
+        from analyse import print_analysis
+        print_analysis('spc-xml', args.input, slides=args.slides)
+        raise SystemExit(0)
+    with instrumented(args.report, args.profile, tool='clean_spacing2', input=args.input):
+        zero_out_spc(args.input, args.output, pack=args.pack, target_dpi=args.dpi,
+                     slides=args.slides)
@@ -3,84 +3,115 @@
 zero_spc_regex.py
 
 Usage:
-    python zero_spc_regex.py input.pptx [output.pptx]
+    python zero_spc_regex.py input.pptx [output.pptx] [--slides SPEC] [--dedupe-media] [--pack] [--dpi N]
 
 What it does:
-1. Unzips the input PPTX (really a ZIP archive) into a temp directory.
-2. Locates every XML part under 'ppt/' (slides, layouts, masters, notes, etc.),
+1. Opens the input PPTX (really a ZIP archive) and streams it, member by
+   member, straight into the output archive. Nothing is extracted to disk.
+2. Looks at every XML part under 'ppt/' (slides, layouts, masters, notes, etc.),
    except any relationship folders (`_rels`) and the root [Content_Types].xml.
-3. Reads each XML file as raw text and applies a single regex:
+   With --slides, only the selected slides, notes or masters are looked at
+   (see selection.py).
+3. Reads each XML part as raw bytes and applies a single regex:
       replace any spc="..." with spc="0"
-4. Writes the text back, preserving all other namespaces, comments,
-   processing instructions and formatting exactly.
-5. Re-zips everything into the specified output file (or `<input>.fixed.pptx`).
+4. Only parts that actually contain a non-zero spc="..." are rewritten,
+   preserving all other namespaces, comments, processing instructions and
+   formatting exactly. Every other member (images, video, `_rels`, ...) is
+   copied as raw compressed bytes, without being decompressed or recompressed.
+5. Member order and compression type are kept as in the input; the result
+   goes to the specified output file (or `<input>.fixed.pptx`).
+6. With --dedupe-media, identical media parts are merged into one
+   (media_dedup.py).
+7. With --pack the output is repacked by packer.py (media stored, XML
+   deflated in parallel, optionally pictures downsampled to --dpi).
 
 This avoids ElementTree’s reserialization pitfalls and keeps PowerPoint from “repairing” your file.
 """
 
-import sys
+import argparse
 import os
-import zipfile
-import tempfile
-import shutil
 import re
+import zipfile
+
+from instrument import add_arguments as add_instrument_arguments, count, instrumented, stage
+from selection import add_argument as add_selection_argument, selected_names
+from zipstream import rewrite_pptx
 
-def zero_spc_in_xml_file(path):
-    """Load XML as text, replace spc="…" with spc="0", write back."""
-    with open(path, 'r', encoding='utf-8') as f:
-        text = f.read()
+SPC_RE = re.compile(rb'\bspc="[^"]*"')
+
+def is_spc_part(info):
+    """True for XML parts under ppt/ that may carry spc attributes."""
+    name = info.filename
+    return (name.startswith('ppt/') and name.lower().endswith('.xml')
+            and '/_rels/' not in name)
+
+def zero_spc_in_xml(data):
+    """Replace spc="…" with spc="0" in raw XML bytes."""
     # Only replace attributes, not other text:
-    new_text = re.sub(r'\bspc="[^"]*"', 'spc="0"', text)
-    if new_text != text:
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(new_text)
+    return SPC_RE.sub(b'spc="0"', data)
 
-def process_pptx(input_pptx, output_pptx=None):
+def process_pptx(input_pptx, output_pptx=None, pack=False, target_dpi=None,
+                 dedupe_media=False, slides=None):
     if not output_pptx:
         base, ext = os.path.splitext(input_pptx)
         output_pptx = f"{base}.fixed{ext}"
 
-    # 1) Unzip to temp
-    tmpdir = tempfile.mkdtemp(prefix="pptx_edit_")
-    try:
+    select = is_spc_part
+    if slides is not None:
         with zipfile.ZipFile(input_pptx, 'r') as zin:
-            zin.extractall(tmpdir)
-
-        # 2) Walk the ppt/ folder
-        ppt_root = os.path.join(tmpdir, 'ppt')
-        for dirpath, dirnames, filenames in os.walk(ppt_root):
-            # skip any _rels directories entirely
-            if os.path.basename(dirpath).lower() == '_rels':
-                continue
+            selected = selected_names(zin, slides)
+        select = lambda info: is_spc_part(info) and info.filename in selected
 
-            for fn in filenames:
-                if not fn.lower().endswith('.xml'):
-                    continue
-                # skip content types at root
-                rel_path = os.path.relpath(os.path.join(dirpath, fn), tmpdir)
-                if rel_path == '[Content_Types].xml':
-                    continue
-                # at this point, it's an XML part under ppt/ (slides, masters, etc.)
-                full_path = os.path.join(dirpath, fn)
-                zero_spc_in_xml_file(full_path)
+    # Stream member by member; untouched members are raw-copied
+    with stage('rewrite'):
+        changed = rewrite_pptx(input_pptx, output_pptx,
+                               lambda name, data: zero_spc_in_xml(data),
+                               select=select)
+    count('parts_rewritten', len(changed))
+    count('bytes_read', os.path.getsize(input_pptx))
 
-        # 3) Re-zip everything (preserve folder structure)
-        with zipfile.ZipFile(output_pptx, 'w', zipfile.ZIP_DEFLATED) as zout:
-            for root, dirs, files in os.walk(tmpdir):
-                for file in files:
-                    absfn = os.path.join(root, file)
-                    arcname = os.path.relpath(absfn, tmpdir)
-                    zout.write(absfn, arcname)
+    if dedupe_media:
+        from media_dedup import dedupe_media as merge_media, print_dedupe_stats
+        with stage('dedupe_media'):
+            print_dedupe_stats(merge_media(output_pptx))
+    if pack or target_dpi:
+        from packer import pack_pptx, print_pack_stats
+        with stage('pack'):
+            print_pack_stats(pack_pptx(output_pptx, target_dpi=target_dpi))
+    count('bytes_written', os.path.getsize(output_pptx))
 
-        print(f"✅ Done. Fixed PPTX written to: {output_pptx}")
+    print(f"✅ Done. Fixed PPTX written to: {output_pptx} ({len(changed)} parts rewritten)")
+    return output_pptx
 
-    finally:
-        shutil.rmtree(tmpdir)
+def analyse(input_pptx, slides=None):
+    """Parts and spc attributes process_pptx would change; writes nothing."""
+    parts = found = 0
+    with zipfile.ZipFile(input_pptx, 'r') as zin:
+        selected = selected_names(zin, slides)
+        for info in zin.infolist():
+            if is_spc_part(info) and (selected is None or info.filename in selected):
+                matches = sum(1 for m in SPC_RE.finditer(zin.read(info)) if m.group() != b'spc="0"')
+                if matches:
+                    parts += 1
+                    found += matches
+    return {'parts_to_rewrite': parts, 'spc_attributes': found, 'needs_work': parts > 0}
 
 if __name__ == "__main__":
-    if not 2 <= len(sys.argv) <= 3:
-        print(__doc__)
-        sys.exit(1)
-    inp = sys.argv[1]
-    outp = sys.argv[2] if len(sys.argv) == 3 else None
-    process_pptx(inp, outp)
+    parser = argparse.ArgumentParser(description="Set every spc attribute in a PPTX to 0")
+    parser.add_argument("input", help="Path to the source .pptx file")
+    parser.add_argument("output", nargs="?", help="Output path (default: <input>.fixed.pptx)")
+    parser.add_argument("--dedupe-media", action="store_true", help="Merge identical media parts")
+    parser.add_argument("--pack", action="store_true", help="Repack the output (see packer.py)")
+    parser.add_argument("--dpi", type=int, help="With --pack, downsample pictures above this DPI")
+    add_selection_argument(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument("--analyse", action="store_true",
+                        help="Only report what would change, as JSON; writes nothing")
+    args = parser.parse_args()
+    if args.analyse:
+        from analyse import print_analysis
+        print_analysis('spc', args.input, slides=args.slides)
+        raise SystemExit(0)
+    with instrumented(args.report, args.profile, tool='clean_spacing3', input=args.input):
+        process_pptx(args.input, args.output, args.pack, args.dpi, args.dedupe_media,
+                     args.slides)
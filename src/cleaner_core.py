@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+cleaner_core.py
+
+Usage:
+    python cleaner_core.py input.pptx [output.pptx] [options]
+
+Headless core of the PowerPoint Cleaner. `clean(input, output, settings)`
+does the same work as the "Process PPTX" button of the Tk app (cleaner.py),
+but imports neither tkinter nor the OCR stack: the OCR engine (ocr.py, with
+pytesseract and PIL) is only loaded, and Tesseract is only looked up, when
+`settings['enable_ocr']` is set.
+
+Every cleanup is a rule of the single-traversal pipeline (pipeline.py,
+rules.py): each slide, layout, master and notes part is parsed and walked
+once, whatever options are turned on. With OCR enabled, picture blobs are
+queued on a pool of OCR workers as their slide is parsed, the rest of the
+deck is processed while they run, and the results (a textbox replacing
+each picture whose text passes `is_mostly_text`) are applied before the
+slide is written.
+
+The command line builds the same settings dict as the GUI; run with --help
+for the options; --large-deck and --max-memory keep the memory use of very
+large decks bounded (see pipeline.run_pipeline). `analyse(input, settings)`
+(--analyse) reports what a run would change without writing anything.
+"""
+
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+from pptx.dml.color import RGBColor
+from pptx.util import Pt
+
+from abbreviations import AbbreviationExpander, load_expander
+from cleaner_options import DUPLICATE_MODES, FONT_FAMILIES, FONT_SIZES, TEXT_SPACING_OPTIONS
+from instrument import add_arguments as add_instrument_arguments, count, instrumented, stage
+from memory import MB, MemoryLimitExceeded
+from pipeline import Cancelled, run_pipeline, scan_pipeline
+from rules import (
+    BackgroundRule, DuplicateShapeRule, NotesAbbreviationRule,
+    OCRCandidateRule, OCRRule, RunFormat, RunFormatRule,
+)
+from selection import add_argument as add_selection_argument, parse_selection
+
+def hex_to_rgb_color(hex_color):
+    """Convert a hex color (e.g. '#FF0000') to an RGBColor."""
+    hex_color = hex_color.lstrip('#')
+    return RGBColor(int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16))
+
+def is_mostly_text(s):
+    """Heuristic: if the string is long enough and the ratio of letters is high, treat it as text."""
+    s = s.strip()
+    if len(s) < 5:
+        return False
+    alpha_count = sum(c.isalpha() for c in s)
+    return (alpha_count / len(s)) > 0.5
+
+# Settings that change how a run is carried out, not its output
+RUN_SETTINGS = ('large_deck', 'memory_limit')
+
+# Define simple word replacements for the speaker notes
+REPLACEMENTS = {
+    'bvb': 'bv',
+    'pt': 'PT',
+    'pten': 'PTen',
+    'pte': 'PTe',
+    'wrs': 'wss',
+    'knn': 'kunnen',
+    'vr': 'voor',
+    'wilt': 'wil',
+    'versch': 'verschillend',
+}
+
+@lru_cache(maxsize=None)
+def notes_expander(path=None):
+    """Compiled expander for the abbreviation table at `path` (default: REPLACEMENTS)."""
+    if path:
+        return load_expander(path)
+    return AbbreviationExpander(REPLACEMENTS)
+
+def build_settings(custom_font=None, custom_font_size=None, text_spacing="Normal",
+                   text_bold=True, text_color="#000000", format_runs=False,
+                   remove_duplicates=False, background_color="#FFFFFF",
+                   set_background=False, remove_animations=False,
+                   enable_ocr=False, remove_theme=False, ocr_cache=True,
+                   abbreviations=None, pack=False, target_dpi=None,
+                   duplicate_mode="slide", dedupe_media=False, ocr_threshold=0.55,
+                   ocr_dpi=300, slides=None, large_deck=False, max_memory_mb=None):
+    """Build the settings dict used by `clean` from GUI/CLI style values.
+
+    A custom font is enabled when `custom_font` is given; `custom_font_size`
+    is in points and `text_spacing` is a key of TEXT_SPACING_OPTIONS.
+    Colors are hex strings such as '#FF0000'. Only the speaker notes are
+    rewritten by default: the text formatting is applied with `format_runs`,
+    the background with `set_background`, and duplicates are removed with
+    `remove_duplicates`. `ocr_cache` is True for the
+    default OCR cache file, a path for another one, or False to disable it.
+    `abbreviations` is a table file for the speaker notes (default: REPLACEMENTS).
+    `pack` repacks the output with packer.py, downsampling pictures above
+    `target_dpi` when that is given. `duplicate_mode` is one of
+    DUPLICATE_MODES (see rules.DuplicateShapeRule). `dedupe_media` merges
+    identical media parts (media_dedup.py). Pictures scoring below
+    `ocr_threshold` in the OCR pre-filter (ocr_prefilter.py, needs NumPy)
+    are not OCR'd; 0 sends every picture to Tesseract. Pictures are
+    rescaled to `ocr_dpi` at their size on the slide, binarised and tiled
+    before OCR (ocr_preprocess.py); 0 sends them as they are. `slides`
+    limits the run to a selection such as '40-60', 'notes' or 'masters'
+    (see selection.py); other parts are copied unchanged. `large_deck`
+    writes each slide before reading the next and OCRs one slide at a time;
+    `max_memory_mb` is a peak-memory ceiling for the run (see memory.py).
+    Neither changes the output.
+    """
+    custom_font_enabled = bool(custom_font)
+    selection = parse_selection(slides)
+    return {
+        'enable_custom_font': custom_font_enabled,
+        'custom_font': custom_font if custom_font_enabled else None,
+        'custom_font_size': Pt(int(custom_font_size or 24)) if custom_font_enabled else None,
+        'text_spacing': TEXT_SPACING_OPTIONS[text_spacing],
+        'text_bold': bool(text_bold),
+        'text_color': hex_to_rgb_color(text_color),
+        'format_runs': bool(format_runs),
+        'remove_duplicates': bool(remove_duplicates),
+        'duplicate_mode': duplicate_mode,
+        'dedupe_media': bool(dedupe_media),
+        'background_color': hex_to_rgb_color(background_color),
+        'set_background': bool(set_background),
+        'remove_animations': bool(remove_animations),
+        'enable_ocr': bool(enable_ocr),
+        'ocr_cache': ocr_cache,
+        'ocr_threshold': float(ocr_threshold or 0),
+        'ocr_dpi': int(ocr_dpi) if ocr_dpi else None,
+        'remove_wordart': False,  # Default setting
+        'remove_theme': bool(remove_theme),
+        'abbreviations': abbreviations,
+        'pack': bool(pack or target_dpi),
+        'target_dpi': int(target_dpi) if target_dpi else None,
+        'slides': str(selection) if selection is not None else None,
+        'large_deck': bool(large_deck),
+        'memory_limit': int(max_memory_mb) * MB if max_memory_mb else None,
+    }
+
+def build_rules(settings, ocr_engine=None):
+    """Pipeline rules (see rules.py) for the cleanups enabled in `settings`."""
+    run_format = RunFormat(settings)
+    rules = [NotesAbbreviationRule(notes_expander(settings.get('abbreviations')))]
+    # duplicates go first so removed textboxes are not formatted
+    if settings['remove_duplicates']:
+        rules.append(DuplicateShapeRule(settings.get('duplicate_mode', 'slide')))
+    if settings.get('format_runs'):
+        # with a slide selection the layouts and masters may not be rewritten,
+        # so every run has to carry its formatting itself
+        rules.append(RunFormatRule(run_format, settings['remove_wordart'],
+                                   push_defaults=not settings.get('slides')))
+    if ocr_engine is not None:
+        rules.append(OCRRule(ocr_engine, run_format))
+    if settings.get('set_background'):
+        rules.append(BackgroundRule(settings['background_color']))
+    # remove_animations: python-pptx had no support for animations and
+    # this remains a placeholder for additional cleanup.
+    return rules
+
+def incremental_key(settings, rules):
+    """Key of everything besides the input deck that the output depends on."""
+    from incremental import settings_key
+    table = settings.get('abbreviations')
+    # how the run is carried out does not change its output
+    settings = {k: v for k, v in settings.items() if k not in RUN_SETTINGS}
+    table_stat = None
+    if table:
+        st = os.stat(table)
+        table_stat = (st.st_size, st.st_mtime_ns)
+    return settings_key(settings, table_stat, [rule.name for rule in rules])
+
+def analyse(input_path, settings=None):
+    """What `clean` would change in `input_path`, without writing anything.
+
+    The rules run on each part in memory (pipeline.scan_pipeline); OCR
+    itself is not run, only the pictures it would look at are counted.
+    """
+    if settings is None:
+        settings = build_settings()
+    rules = build_rules(settings)
+    candidates = OCRCandidateRule()
+    changes = scan_pipeline(input_path, rules + [candidates], selection=settings.get('slides'))
+    stats = {
+        'abbreviations': rules[0].expansions,
+        'notes_shapes': changes['NotesAbbreviationRule'],
+        'duplicate_shapes': changes.get('DuplicateShapeRule', 0),
+        'formatted_shapes': changes.get('RunFormatRule', 0),
+        'backgrounds': changes.get('BackgroundRule', 0),
+        'ocr_candidates': candidates.changes,
+    }
+    stats['needs_work'] = bool(any(v for k, v in stats.items() if k != 'ocr_candidates')
+                               or settings['enable_ocr'] and candidates.changes)
+    return stats
+
+def clean(input_path, output_path=None, settings=None, incremental=False,
+          progress=None, cancel=None):
+    """Clean `input_path` and save the result to `output_path`.
+
+    Without an output path the result goes next to the input as
+    `<input>_cleaned.pptx`; without settings the GUI defaults are used.
+    With `incremental`, a fingerprint manifest is kept next to the output
+    and only the parts that changed since the previous run are processed.
+    `progress(slides_done, slides_total, ocr_pending)` is called as slides
+    are written; setting the `cancel` event raises pipeline.Cancelled and
+    leaves no output behind. Returns the output path.
+    """
+    if output_path is None:
+        base, ext = os.path.splitext(input_path)
+        output_path = f"{base}_cleaned{ext}"
+    if settings is None:
+        settings = build_settings()
+
+    ocr_engine = None
+    ocr_cache = None
+    if settings['enable_ocr']:
+        from ocr import OCREngine, load_prefilter
+        prefilter = None
+        if settings.get('ocr_threshold'):
+            prefilter = load_prefilter(settings['ocr_threshold'])
+        if settings.get('ocr_cache'):
+            from ocr_cache import OCRCache
+            cache_path = settings['ocr_cache']
+            ocr_cache = OCRCache(None if cache_path is True else cache_path)
+        ocr_engine = OCREngine(cache=ocr_cache, classify=is_mostly_text, prefilter=prefilter,
+                               dpi=settings.get('ocr_dpi'))
+    try:
+        # One pass over the deck; pictures are OCR'd in the background while
+        # the remaining parts are processed
+        rules = build_rules(settings, ocr_engine)
+        key = incremental_key(settings, rules) if incremental else None
+        report = None
+        if progress is not None:
+            def report(done, total):
+                progress(done, total, ocr_engine.pending if ocr_engine is not None else 0)
+        with stage('pipeline'):
+            stats = run_pipeline(input_path, output_path, rules, key, report, cancel,
+                                 selection=settings.get('slides'),
+                                 large_deck=settings.get('large_deck', False),
+                                 memory_limit=settings.get('memory_limit'))
+        if stats.get('peak_memory'):
+            limit = settings.get('memory_limit')
+            print(f"Memory: peak {stats['peak_memory'] / MB:.0f} MB"
+                  + (f" (limit {limit / MB:.0f} MB)" if limit else ""))
+        if 'reused' in stats:
+            print(f"Incremental: {stats['reused']} unchanged parts reused from the previous output")
+        notes_rule = rules[0]
+        print(f"Notes: {notes_rule.expansions} abbreviations expanded in {notes_rule.changes} shapes, "
+              f"{notes_rule.skipped} unchanged shapes skipped")
+    finally:
+        if ocr_engine is not None:
+            ocr_engine.close()
+            if ocr_engine.prefilter is not None:
+                print(f"OCR pre-filter: {ocr_engine.skipped} images skipped "
+                      f"(threshold {settings['ocr_threshold']})")
+        if ocr_cache is not None:
+            stats = ocr_cache.stats()
+            print(f"OCR cache: {stats['hits']} hits, {stats['misses']} misses")
+            ocr_cache.close()
+
+    if settings.get('dedupe_media'):
+        from media_dedup import dedupe_media, print_dedupe_stats
+        with stage('dedupe_media'):
+            print_dedupe_stats(dedupe_media(output_path))
+    if settings.get('pack'):
+        from packer import pack_pptx, print_pack_stats
+        with stage('pack'):
+            print_pack_stats(pack_pptx(output_path, target_dpi=settings.get('target_dpi')))
+    count('bytes_written', os.path.getsize(output_path))
+    return output_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clean a PPTX without the GUI (same settings as cleaner.py)"
+    )
+    parser.add_argument("input", help="Path to the source .pptx file")
+    parser.add_argument("output", nargs="?", help="Output path (default: <input>_cleaned.pptx)")
+    parser.add_argument("--font", choices=FONT_FAMILIES, help="Enable a custom font family")
+    parser.add_argument("--font-size", choices=FONT_SIZES, default="24", help="Custom font size in points")
+    parser.add_argument("--spacing", choices=list(TEXT_SPACING_OPTIONS), default="Normal", help="Text spacing")
+    parser.add_argument("--format-runs", action="store_true",
+                        help="Apply the text formatting (font, bold, color, spacing) to the slides")
+    parser.add_argument("--no-bold", action="store_true", help="Do not make text bold")
+    parser.add_argument("--text-color", default="#000000", help="Text color as hex (default: #000000)")
+    parser.add_argument("--remove-duplicates", action="store_true", help="Remove duplicate textboxes and pictures")
+    parser.add_argument("--duplicates", choices=DUPLICATE_MODES, default="slide",
+                        help="Where to look for duplicates: same slide, whole deck, or layout/master")
+    parser.add_argument("--background", action="store_true", help="Set the slide background color")
+    parser.add_argument("--bg-color", default="#FFFFFF", help="Slide background color as hex (default: #FFFFFF)")
+    parser.add_argument("--remove-animations", action="store_true", help="Remove animations (if possible)")
+    parser.add_argument("--ocr", action="store_true", help="Enable OCR on images (needs Tesseract)")
+    parser.add_argument("--ocr-cache", default=True, help="OCR cache file (default: per-user cache)")
+    parser.add_argument("--no-ocr-cache", dest="ocr_cache", action="store_false", help="Do not cache OCR results")
+    parser.add_argument("--ocr-threshold", type=float, default=0.55,
+                        help="Skip pictures scoring below this in the OCR pre-filter (0 = OCR all)")
+    parser.add_argument("--ocr-dpi", type=int, default=300,
+                        help="Rescale pictures to this DPI at their slide size before OCR (0 = as they are)")
+    parser.add_argument("--abbreviations", help="Abbreviation table for the speaker notes (JSON or TSV)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-process parts that changed since the last run (keeps <output>.manifest.json)")
+    parser.add_argument("--remove-theme", action="store_true", help="Remove presentation theme")
+    parser.add_argument("--large-deck", action="store_true",
+                        help="Keep memory flat on very large decks: write each slide before "
+                             "reading the next, OCR one slide at a time")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="Peak memory ceiling in MB; the run fails cleanly above it")
+    add_selection_argument(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument("--analyse", action="store_true",
+                        help="Only report what would change, as JSON (see analyse.py); writes nothing")
+    parser.add_argument("--dedupe-media", action="store_true",
+                        help="Merge identical media parts into one (see media_dedup.py)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Repack the output: store media, deflate XML in parallel (see packer.py)")
+    parser.add_argument("--dpi", type=int, help="With --pack, downsample pictures above this DPI")
+    args = parser.parse_args(argv)
+
+    settings = build_settings(
+        custom_font=args.font,
+        custom_font_size=args.font_size,
+        text_spacing=args.spacing,
+        text_bold=not args.no_bold,
+        text_color=args.text_color,
+        format_runs=args.format_runs,
+        remove_duplicates=args.remove_duplicates,
+        duplicate_mode=args.duplicates,
+        background_color=args.bg_color,
+        set_background=args.background,
+        remove_animations=args.remove_animations,
+        enable_ocr=args.ocr,
+        remove_theme=args.remove_theme,
+        ocr_cache=args.ocr_cache,
+        ocr_threshold=args.ocr_threshold,
+        ocr_dpi=args.ocr_dpi,
+        abbreviations=args.abbreviations,
+        dedupe_media=args.dedupe_media,
+        pack=args.pack,
+        target_dpi=args.dpi,
+        slides=args.slides,
+        large_deck=args.large_deck,
+        max_memory_mb=args.max_memory,
+    )
+    if args.analyse:
+        from analyse import print_analysis
+        print_analysis('cleaner', args.input, settings=settings)
+        return 0
+    try:
+        with instrumented(args.report, args.profile, tool='cleaner', input=args.input):
+            output_path = clean(args.input, args.output, settings, incremental=args.incremental)
+            print(f"Processed file saved as: {output_path}")
+    except MemoryLimitExceeded as e:
+        hint = "a higher --max-memory" if settings['large_deck'] else "--large-deck or a higher --max-memory"
+        print(f"❌ {e}; try {hint}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""
+cleaner_options.py
+
+The choices offered by the cleaner's GUI and command line.
+
+Kept free of third-party imports, so the Tk window (cleaner.py) can be
+built from them before python-pptx, lxml and the rule pipeline are loaded.
+"""
+
+# Define text spacing options with their corresponding numeric values
+# Values are in points/100 (e.g. -1.5 points = -150)
+TEXT_SPACING_OPTIONS = {
+    "Very Tight": -150,  # -1.5 points
+    "Tight": -50,        # -0.5 points
+    "Normal": 0,         # 0 points (default)
+    "Loose": 50,         # 0.5 points
+    "Very Loose": 150    # 1.5 points
+}
+
+FONT_FAMILIES = ["Calibri", "Aptos", "Arial", "Times New Roman", "Verdana", "Helvetica"]
+FONT_SIZES = ["12", "14", "16", "18", "20", "22", "24", "26", "28", "30"]
+
+# Where duplicate shapes are looked for (see rules.DuplicateShapeRule)
+DUPLICATE_MODES = ('slide', 'deck', 'layout')
@@ -0,0 +1,113 @@
+"""
+duplicates.py
+
+Hash index for finding duplicate shapes in one linear pass over a deck.
+
+A shape is reduced to a key that is looked up in a dict, so every check is
+O(1) however many shapes were seen before:
+
+- text shapes: a hash of their normalised text (case folded, whitespace
+  collapsed), so "Total  Revenue" and "total revenue" are the same box;
+- pictures: the CRC-32 and size of the image member from the ZIP central
+  directory (nothing is decompressed); when two different members collide
+  their bytes are compared once to confirm;
+- optionally the geometry, with left/top/width/height rounded to a grid of
+  GEOMETRY_BUCKET EMU, so boxes nudged by a few pixels still match.
+"""
+
+import hashlib
+import re
+
+from pipeline import A, NSMAP, P
+
+# 0.05 inch
+GEOMETRY_BUCKET = 45720
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalise_text(text):
+    """Text with case and whitespace noise removed."""
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def text_hash(text):
+    return hashlib.sha1(normalise_text(text).encode('utf-8')).hexdigest()
+
+
+def geometry_bucket(shape):
+    """(left, top, width, height) rounded to GEOMETRY_BUCKET, or None."""
+    xfrm = shape.find('p:spPr/a:xfrm', NSMAP)
+    if xfrm is None:
+        return None
+    off, ext = xfrm.find(A + 'off'), xfrm.find(A + 'ext')
+    if off is None or ext is None:
+        return None
+    return tuple(round(int(value) / GEOMETRY_BUCKET) for value in
+                 (off.get('x', 0), off.get('y', 0), ext.get('cx', 0), ext.get('cy', 0)))
+
+
+def is_placeholder(shape):
+    return shape.find('*/p:nvPr/p:ph', NSMAP) is not None
+
+
+def picture_target(pic, part):
+    """Member name of the image shown by `pic`, or None."""
+    blip = pic.find('p:blipFill/a:blip', NSMAP)
+    if blip is None:
+        return None
+    return part.rels.get(blip.get('{%s}embed' % NSMAP['r']))
+
+
+class DuplicateIndex:
+    """Set of shape keys with O(1) membership, for text and picture shapes."""
+
+    def __init__(self, use_geometry=False):
+        self.use_geometry = use_geometry
+        self._keys = {}
+
+    def clear(self):
+        self._keys.clear()
+
+    def key(self, shape, part, text=None):
+        """Key of a text shape (pass its `text`) or a picture, or None."""
+        geometry = None
+        if self.use_geometry:
+            geometry = geometry_bucket(shape)
+            if geometry is None:
+                return None
+        if shape.tag == P + 'pic':
+            name = picture_target(shape, part)
+            if name is None:
+                return None
+            info = part.info_of(name)
+            if info is None:
+                return None
+            return ('pic', info.CRC, info.file_size, geometry), name
+        if text is None:
+            return None
+        return ('text', text_hash(text), geometry), None
+
+    def seen(self, key, part):
+        """True if `key` (from `key()`) was added before."""
+        if key is None:
+            return False
+        key, name = key
+        if key not in self._keys:
+            return False
+        first_name = self._keys[key]
+        if name is None or name == first_name:
+            return True
+        # same CRC and size: make sure the pictures really are identical
+        return part.read(name) == part.read(first_name)
+
+    def add(self, key):
+        if key is not None:
+            self._keys.setdefault(key[0], key[1])
+
+    def check(self, key, part):
+        """True if `key` is a duplicate; otherwise remember it."""
+        if self.seen(key, part):
+            return True
+        self.add(key)
+        return False
@@ -0,0 +1,116 @@
+"""
+incremental.py
+
+Fingerprint manifest for incremental re-processing.
+
+Next to an output deck the pipeline can keep a sidecar manifest
+(`<output>.manifest.json`) holding:
+
+- a key for the settings/rules the output was produced with,
+- for every transformed part, the fingerprint of its input: the part
+  itself, its `_rels` and every member it links to (so a slide is redone
+  when one of its pictures changes),
+- the CRC of every member as written to the output, to notice outputs that
+  were edited afterwards.
+
+Member fingerprints are a BLAKE2b hash of the decompressed bytes plus the
+size. The CRC-32 in the ZIP directory would be free to read, but it is not
+a content hash: a same-size edit with a colliding CRC would silently reuse
+stale output. A member linked from many slides (a logo) is hashed once per
+run.
+
+On the next run a part whose fingerprint is unchanged is copied as raw
+bytes from the previous output instead of being transformed again.
+"""
+
+import hashlib
+import json
+import posixpath
+
+from lxml import etree
+
+MANIFEST_VERSION = 2
+_HASH_CHUNK = 1024 * 1024
+PR = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def manifest_path(output_pptx):
+    return output_pptx + '.manifest.json'
+
+
+def settings_key(*values):
+    """Stable hash of the settings (and anything else) an output depends on."""
+    blob = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def member_fingerprint(zin, info, digests=None):
+    """Size and content hash of a member; `digests` caches them by name."""
+    if digests is not None and info.filename in digests:
+        return digests[info.filename]
+    digest = hashlib.blake2b(digest_size=16)
+    with zin.open(info) as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    fingerprint = f"{info.file_size}:{digest.hexdigest()}"
+    if digests is not None:
+        digests[info.filename] = fingerprint
+    return fingerprint
+
+
+def part_fingerprint(zin, info, rels_name, digests=None):
+    """Fingerprint of a part, its relationships and the members they target.
+
+    Pass the same `digests` dict for every part of a package, so members
+    shared by several parts are hashed once.
+    """
+    names = zin.NameToInfo
+    prints = [member_fingerprint(zin, info, digests)]
+    rels = names.get(rels_name)
+    if rels is not None:
+        prints.append(member_fingerprint(zin, rels, digests))
+        directory = posixpath.dirname(info.filename)
+        for rel in etree.fromstring(zin.read(rels)).iter(PR + 'Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(directory, target))
+            if target in names:
+                prints.append(f"{target}={member_fingerprint(zin, names[target], digests)}")
+    return hashlib.sha256('|'.join(prints).encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """Fingerprints of the parts an output deck was built from."""
+
+    def __init__(self, key, parts=None, output_crcs=None):
+        self.key = key
+        self.parts = parts or {}
+        self.output_crcs = output_crcs or {}
+
+    @classmethod
+    def load(cls, output_pptx):
+        """The manifest stored next to `output_pptx`, or None."""
+        try:
+            with open(manifest_path(output_pptx), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(data['key'], data['parts'], data['output_crcs'])
+
+    def save(self, output_pptx):
+        with open(manifest_path(output_pptx), 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'key': self.key,
+                       'parts': self.parts, 'output_crcs': self.output_crcs},
+                      f, indent=1, sort_keys=True)
+
+    def reusable(self, name, fingerprint, previous_info):
+        """True if the previous output of `name` can be copied as is."""
+        return (previous_info is not None
+                and self.parts.get(name) == fingerprint
+                and self.output_crcs.get(name) == previous_info.CRC)
@@ -0,0 +1,195 @@
+"""
+instrument.py
+
+Per-stage timing and counters for the cleaning tools, plus an optional
+profiler dump.
+
+Instrumentation is off unless a tool is run with --report (or `enable()` is
+called). While it is off `stage()` hands out one shared no-op context
+manager and `count()` returns straight away, so the calls left in the code
+cost next to nothing.
+
+    with stage('parse'):              # wall and CPU time, number of calls
+        ...
+    count('slides')                   # counters: slides, runs, bytes, ...
+
+Stages may nest (e.g. 'pipeline' around 'parse'); each one is reported on
+its own. CPU time is process CPU time, so it includes worker threads
+running at the same time. `instrumented(report, profile)` wraps a run and
+writes the JSON report and/or a cProfile dump (or a pyinstrument HTML page
+when the profile path ends in .html and pyinstrument is installed).
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+
+_active = None
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.instrument.add(self.name, time.perf_counter() - self.wall,
+                            time.process_time() - self.cpu)
+        return False
+
+
+class Instrument:
+    """Collects stage timings and counters for one run."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, wall, cpu=None):
+        with self._lock:
+            entry = self.stages.setdefault(name, {'wall_s': 0.0, 'calls': 0})
+            entry['wall_s'] += wall
+            entry['calls'] += 1
+            if cpu is not None:
+                entry['cpu_s'] = entry.get('cpu_s', 0.0) + cpu
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def report(self, **extra):
+        stages = {name: {key: round(value, 6) if isinstance(value, float) else value
+                         for key, value in entry.items()}
+                  for name, entry in self.stages.items()}
+        return {**extra,
+                'wall_s': round(time.perf_counter() - self.started, 6),
+                'stages': stages,
+                'counts': dict(self.counts)}
+
+
+def enable():
+    """Start collecting; returns the new Instrument."""
+    global _active
+    _active = Instrument()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active():
+    """The collecting Instrument, or None when instrumentation is off."""
+    return _active
+
+
+def stage(name):
+    """Context manager timing stage `name` (a no-op when off)."""
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name)
+
+
+def count(name, n=1):
+    """Add `n` to counter `name` (a no-op when off)."""
+    if _active is not None:
+        _active.count(name, n)
+
+
+def _start_profiler(path):
+    if path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; writing a cProfile dump instead", file=sys.stderr)
+            path = path[:-len('.html')] + '.prof'
+        else:
+            profiler = Profiler()
+            profiler.start()
+
+            def stop():
+                profiler.stop()
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+            return stop, path
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop():
+        profiler.disable()
+        profiler.dump_stats(path)
+    return stop, path
+
+
+@contextlib.contextmanager
+def instrumented(report=None, profile=None, **extra):
+    """Instrument the enclosed run.
+
+    `report` is a path for the JSON report ('-' for stdout), `profile` a path
+    for the profiler dump; without either nothing is collected. `extra`
+    (e.g. tool and input names) is added to the report. With the report on
+    stdout, whatever the run prints goes to stderr instead, so stdout holds
+    nothing but the JSON.
+    """
+    if not report and not profile:
+        yield None
+        return
+    instrument = enable() if report else None
+    stop_profiler = None
+    if profile:
+        stop_profiler, profile = _start_profiler(profile)
+    stdout = sys.stdout
+    try:
+        if report == '-':
+            with contextlib.redirect_stdout(sys.stderr):
+                yield instrument
+        else:
+            yield instrument
+    finally:
+        if stop_profiler is not None:
+            stop_profiler()
+            print(f"Profile written to: {profile}", file=sys.stderr)
+        if instrument is not None:
+            disable()
+            text = json.dumps(instrument.report(**extra), indent=2)
+            if report == '-':
+                print(text, file=stdout)
+            else:
+                with open(report, 'w', encoding='utf-8') as f:
+                    f.write(text + '\n')
+                print(f"Report written to: {report}", file=sys.stderr)
+
+
+def add_arguments(parser):
+    """Add --report and --profile to an argparse parser."""
+    parser.add_argument("--report", metavar="FILE",
+                        help="Write per-stage timings and counts as JSON "
+                             "('-' for stdout; other output then goes to stderr)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Write a cProfile dump (or pyinstrument HTML for *.html)")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+media_dedup.py
+
+Usage:
+    python media_dedup.py input.pptx [output.pptx]
+
+Collapses identical media parts into one (also run by the cleaner and
+clean_spacing3 with --dedupe-media):
+1. Finds identical members under 'ppt/media/'. Candidates are grouped by
+   the CRC-32 and size in the ZIP central directory, and only members that
+   share both are decompressed and compared by SHA-256.
+2. Keeps the first copy of each blob, and points every relationship
+   (`_rels/*.rels`) that targeted another copy at it.
+3. Drops the copies, as well as media no relationship refers to any more,
+   together with their `[Content_Types].xml` overrides.
+4. Copies every other member as raw compressed bytes, and prints the bytes
+   reclaimed. Without an output path the deck is rewritten in place.
+"""
+
+import argparse
+import hashlib
+import os
+import posixpath
+import shutil
+import sys
+import zipfile
+from urllib.parse import quote, unquote
+
+from lxml import etree
+
+from pipeline import PR, serialize
+from zipstream import copy_member, write_member
+
+CT = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+MEDIA_PREFIX = 'ppt/media/'
+
+
+def is_media(name):
+    return name.startswith(MEDIA_PREFIX)
+
+
+def duplicate_media(zin):
+    """Duplicate media name -> name of the first identical copy."""
+    candidates = {}
+    for info in zin.infolist():
+        if is_media(info.filename):
+            candidates.setdefault((info.CRC, info.file_size), []).append(info)
+
+    duplicates = {}
+    for infos in candidates.values():
+        if len(infos) < 2:
+            continue
+        first_by_digest = {}
+        for info in infos:
+            digest = hashlib.sha256(zin.read(info)).digest()
+            first = first_by_digest.setdefault(digest, info.filename)
+            if first != info.filename:
+                duplicates[info.filename] = first
+    return duplicates
+
+
+def rels_source_dir(rels_name):
+    """Directory relative targets in `rels_name` are resolved against."""
+    return posixpath.dirname(posixpath.dirname(rels_name))
+
+
+def resolve_target(source_dir, target):
+    """Member name a relationship target points at.
+
+    Targets are URIs, so 'my%20image1.png' is the member 'my image1.png'.
+    """
+    target = unquote(target)
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(source_dir, target))
+
+
+def relink_rels(data, rels_name, duplicates, referenced):
+    """Rewrite targets of one .rels part; returns new bytes or None if unchanged.
+
+    Every internal target left after rewriting is added to `referenced`.
+    """
+    root = etree.fromstring(data)
+    source_dir = rels_source_dir(rels_name)
+    changed = False
+    for rel in root.iter(PR + 'Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target')
+        resolved = resolve_target(source_dir, target)
+        canonical = duplicates.get(resolved)
+        if canonical is not None:
+            if target.startswith('/'):
+                rel.set('Target', quote('/' + canonical))
+            else:
+                rel.set('Target', quote(posixpath.relpath(canonical, source_dir or '.')))
+            resolved = canonical
+            changed = True
+        referenced.add(resolved)
+    return serialize(root) if changed else None
+
+
+def drop_overrides(data, names):
+    """[Content_Types].xml without the overrides of `names`, or None if unchanged."""
+    root = etree.fromstring(data)
+    part_names = {'/' + name for name in names}
+    changed = False
+    for override in list(root.iter(CT + 'Override')):
+        if override.get('PartName') in part_names:
+            root.remove(override)
+            changed = True
+    return serialize(root) if changed else None
+
+
+def dedupe_media(input_pptx, output_pptx=None):
+    """Merge identical media of `input_pptx`; returns a stats dict."""
+    in_place = output_pptx is None or os.path.abspath(output_pptx) == os.path.abspath(input_pptx)
+    target_path = input_pptx if in_place else output_pptx
+    tmp_path = target_path + '.media.tmp'
+    stats = {'duplicates': 0, 'orphans': 0, 'bytes_reclaimed': 0}
+
+    try:
+        with zipfile.ZipFile(input_pptx, 'r') as zin:
+            duplicates = duplicate_media(zin)
+            # relink every .rels up front, so orphans are known before writing
+            referenced = set()
+            new_rels = {}
+            for info in zin.infolist():
+                if info.filename.endswith('.rels'):
+                    new_rels[info.filename] = relink_rels(zin.read(info), info.filename,
+                                                          duplicates, referenced)
+            dropped = {info.filename for info in zin.infolist()
+                       if is_media(info.filename) and info.filename not in referenced}
+            if not dropped:
+                if not in_place:
+                    shutil.copyfile(input_pptx, output_pptx)
+                return stats
+
+            with zipfile.ZipFile(tmp_path, 'w') as zout:
+                for info in zin.infolist():
+                    name = info.filename
+                    if name in dropped:
+                        stats['duplicates' if name in duplicates else 'orphans'] += 1
+                        stats['bytes_reclaimed'] += info.compress_size
+                        continue
+                    if name == '[Content_Types].xml':
+                        data = drop_overrides(zin.read(info), dropped)
+                    else:
+                        data = new_rels.get(name)
+                    if data is None:
+                        copy_member(zin, zout, info)
+                    else:
+                        write_member(zout, info, data)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return stats
+
+
+def print_dedupe_stats(stats):
+    print(f"🖼️  Media: {stats['duplicates']} duplicate and {stats['orphans']} orphaned parts "
+          f"dropped, {stats['bytes_reclaimed'] / 1e6:.2f} MB reclaimed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge identical media parts of a PPTX")
+    parser.add_argument("input", help="Path to the .pptx file")
+    parser.add_argument("output", nargs="?", help="Output path (default: rewrite in place)")
+    args = parser.parse_args(argv)
+    print_dedupe_stats(dedupe_media(args.input, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
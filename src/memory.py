@@ -0,0 +1,115 @@
+"""
+memory.py
+
+Memory readings and a peak-memory ceiling for the large-deck mode (see
+pipeline.run_pipeline).
+
+`rss()` is the resident set size of this process right now and `peak_rss()`
+its high-water mark, both in bytes: read from /proc/self/statm and
+getrusage on Linux, and from GetProcessMemoryInfo on Windows. Either is
+None where it cannot be read (`rss()` on macOS, for one). Tesseract runs
+in child processes, which are not counted.
+
+A `MemoryCeiling` is checked by the pipeline between two parts: once the
+process goes over it, read-ahead stops and the pending work (OCR) is
+drained; if that does not bring it back under, the run fails with
+MemoryLimitExceeded instead of being killed by the operating system. The
+peak can overshoot the ceiling by what one part and the OCR running next
+to it take.
+"""
+
+import ctypes
+import os
+import sys
+
+MB = 1024 * 1024
+
+
+class MemoryLimitExceeded(MemoryError):
+    """Raised when a run stays above its memory ceiling."""
+
+
+if sys.platform == 'win32':
+    from ctypes import wintypes
+
+    class _ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    def _counters():
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(),
+                                                ctypes.byref(counters), counters.cb):
+            return None
+        return counters
+
+    def rss():
+        """Resident set size of this process in bytes, or None."""
+        counters = _counters()
+        return counters.WorkingSetSize if counters is not None else None
+
+    def peak_rss():
+        """Highest resident set size of this process so far in bytes, or None."""
+        counters = _counters()
+        return counters.PeakWorkingSetSize if counters is not None else None
+
+else:
+    import resource
+
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def rss():
+        """Resident set size of this process in bytes, or None."""
+        try:
+            with open('/proc/self/statm', 'rb') as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def peak_rss():
+        """Highest resident set size of this process so far in bytes, or None."""
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryCeiling:
+    """Peak-memory limit of `limit` bytes, checked with `over()`.
+
+    `high_water` is the highest resident set size `over()` has seen.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.high_water = 0
+        if rss() is None:
+            print("⚠️  The memory use of this process cannot be read here; "
+                  "the memory limit is not enforced", file=sys.stderr)
+
+    def over(self):
+        """True when the process uses more than the limit right now."""
+        current = rss()
+        if current is None:
+            return False
+        self.high_water = max(self.high_water, current)
+        return current > self.limit
+
+    def enforce(self, where):
+        """Raise MemoryLimitExceeded when over the limit."""
+        if self.over():
+            raise MemoryLimitExceeded(
+                f"Memory use {rss() / MB:.0f} MB is above the limit of "
+                f"{self.limit / MB:.0f} MB {where}")
@@ -0,0 +1,228 @@
+"""
+ocr.py
+
+Parallel OCR for picture shapes.
+
+`OCREngine` keeps a bounded pool of worker threads alive for the whole job
+(sized to the number of cores by default). Each worker hands one image to a
+Tesseract subprocess, so the threads spend their time waiting and the
+recognitions run concurrently. Images are submitted up front and the caller
+collects the results later, so the rest of the document can be processed
+while OCR runs.
+
+With an `OCRCache` (ocr_cache.py) attached, every blob is looked up by its
+content hash before it reaches Tesseract, and identical images queued twice
+in the same job share a single recognition. With a pre-filter
+(ocr_prefilter.py), images that are unlikely to hold text are skipped and
+resolve to empty text without running Tesseract. With a `dpi`, images are
+shrunk to what the slide actually shows, binarised and split into tiles
+(ocr_preprocess.py) before recognition.
+
+This module imports pytesseract and PIL at the top; only import it when OCR
+is actually enabled.
+"""
+
+import io
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytesseract
+from PIL import Image
+
+from instrument import count, stage
+from ocr_cache import cache_key
+from ocr_preprocess import preprocess
+
+# Every Tesseract process would otherwise start one OpenMP thread per core;
+# with one process per core that oversubscribes the CPU badly.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def find_tesseract():
+    """Point pytesseract at the Tesseract executable found in PATH."""
+    # Search for the tesseract executable in the system PATH
+    tesseract_path = shutil.which("tesseract")
+    if tesseract_path is None:
+        raise EnvironmentError("Tesseract executable not found in PATH. Please install Tesseract OCR.")
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    return tesseract_path
+
+
+def ocr_image(image, lang=None, psm=None):
+    """Run Tesseract on a PIL image and return the stripped text."""
+    config = f"--psm {psm}" if psm is not None else ""
+    return pytesseract.image_to_string(image, lang=lang, config=config).strip()
+
+
+def ocr_blob(blob, lang=None, psm=None):
+    """Run Tesseract on the bytes of an image and return the stripped text."""
+    with io.BytesIO(blob) as stream, Image.open(stream) as image:
+        return ocr_image(image, lang, psm)
+
+
+def load_prefilter(threshold):
+    """The NumPy pre-filter at `threshold`, or None if NumPy is missing."""
+    try:
+        from ocr_prefilter import Prefilter
+    except ImportError:
+        print("NumPy is not installed; the OCR pre-filter is off")
+        return None
+    return Prefilter(threshold)
+
+
+class OCREngine:
+    """A pool of OCR workers shared by every picture of a job.
+
+    `classify(text)` gives the verdict stored alongside the text (e.g.
+    `is_mostly_text`); futures resolve to `(text, verdict)`. `prefilter(image)`
+    returning False skips an image; `skipped` counts those. With `dpi` set,
+    images are rescaled to that resolution at their display size, binarised
+    and cut into tiles first (ocr_preprocess.py); the tiles are recognised
+    in parallel on the same pool.
+    """
+
+    def __init__(self, workers=None, lang=None, psm=None, cache=None, classify=bool,
+                 prefilter=None, dpi=None):
+        find_tesseract()
+        self.workers = workers or os.cpu_count() or 1
+        self.lang = lang
+        self.psm = psm
+        self.cache = cache
+        self.classify = classify
+        self.prefilter = prefilter
+        self.dpi = dpi
+        self.skipped = 0
+        self.version = str(pytesseract.get_tesseract_version()) if cache is not None else None
+        self._pending = {}
+        self._outstanding = set()
+        # guards _outstanding and the counters, which worker callbacks update;
+        # notified when the last outstanding image is done
+        self._idle = threading.Condition()
+        self._submitted = 0
+        self._finished = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix="ocr")
+
+    def _prepare(self, blob, display_size):
+        """Tiles of the image to recognise, or None if it is skipped."""
+        # the buffer and the decoded image are released as soon as the tiles are cut
+        with io.BytesIO(blob) as stream, Image.open(stream) as image:
+            if self.prefilter is not None:
+                with stage('prefilter'):
+                    wanted = self.prefilter(image)
+                if not wanted:
+                    # not cached: the verdict depends on the threshold
+                    with self._idle:
+                        self.skipped += 1
+                    count('images_skipped')
+                    return None
+            if self.dpi is None:
+                image.load()
+                return [image.copy()]
+            with stage('preprocess'):
+                tiles = preprocess(image, display_size, self.dpi)
+        count('tiles', len(tiles))
+        return tiles
+
+    def _tesseract(self, tile):
+        with stage('tesseract'):
+            return ocr_image(tile, self.lang, self.psm)
+
+    def _recognise(self, prepared, future, key):
+        # runs as a callback once the image is prepared: queue its tiles and
+        # merge them when the last one is in, without blocking a worker
+        try:
+            tiles = prepared.result()
+            if tiles is None:
+                future.set_result(("", False))
+                return
+            parts = [self._pool.submit(self._tesseract, tile) for tile in tiles]
+        except Exception as e:
+            future.set_exception(e)
+            return
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def collect(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._merge(parts, future, key)
+
+        for part in parts:
+            part.add_done_callback(collect)
+
+    def _merge(self, parts, future, key):
+        try:
+            # tiles are strips from top to bottom, so this is reading order
+            text = "\n".join(t for t in (part.result() for part in parts) if t)
+            verdict = bool(self.classify(text))
+            if key is not None:
+                self.cache.put(key, text, verdict)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        count('images_ocrd')
+        future.set_result((text, verdict))
+
+    def submit(self, blob, display_size=None):
+        """Queue an image for OCR; returns a Future resolving to (text, verdict).
+
+        `display_size` is the (cx, cy) in EMU the picture is shown at on the
+        slide; without it images are not rescaled.
+        """
+        key = None
+        if self.cache is not None:
+            version = self.version
+            if self.dpi is not None:
+                # the preprocessed image, and so the text, depends on both
+                version = f"{version}|{self.dpi}dpi|{display_size or ''}"
+            key = cache_key(blob, self.lang, self.psm, version)
+            if key in self._pending:
+                return self._pending[key]
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                self._pending[key] = future
+                return future
+        future = Future()
+        with self._idle:
+            self._submitted += 1
+            self._outstanding.add(future)
+        future.add_done_callback(self._done)
+        prepared = self._pool.submit(self._prepare, blob, display_size)
+        prepared.add_done_callback(lambda prepared: self._recognise(prepared, future, key))
+        if key is not None:
+            self._pending[key] = future
+        return future
+
+    def _done(self, future):
+        with self._idle:
+            self._finished += 1
+            self._outstanding.discard(future)
+            if not self._outstanding:
+                self._idle.notify_all()
+
+    @property
+    def pending(self):
+        """Number of images queued or being recognised."""
+        return self._submitted - self._finished
+
+    def close(self, cancel=False):
+        if not cancel:
+            # tiles are queued from callbacks, so let every image finish
+            # (its tiles included) before the pool stops taking work
+            with self._idle:
+                self._idle.wait_for(lambda: not self._outstanding)
+        self._pool.shutdown(wait=not cancel, cancel_futures=cancel)
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
@@ -0,0 +1,121 @@
+"""
+ocr_cache.py
+
+Persistent, content-addressed cache of OCR results.
+
+Entries are keyed by the SHA-256 of the image bytes plus the Tesseract
+language, page segmentation mode and version, and hold the OCR text and the
+`is_mostly_text` verdict. The cache is a single SQLite file, so it can be
+shared by every worker process on a machine (or a fleet, on a shared drive):
+a logo that appears on every slide of every deck is OCR'd once.
+
+The cache is bounded in size: once the stored text exceeds `max_bytes` the
+least recently used entries are evicted. Hits and misses are counted per
+`OCRCache` instance.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Evict down to this fraction of max_bytes so eviction does not run on every put
+_EVICT_TO = 0.9
+_EVICT_EVERY = 256
+
+
+def default_cache_path():
+    """Per-user cache file (overridable with PPT_CLEANER_OCR_CACHE)."""
+    path = os.environ.get("PPT_CLEANER_OCR_CACHE")
+    if path:
+        return path
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "powerpoint-cleaner", "ocr_cache.sqlite")
+
+
+def cache_key(blob, lang, psm, version):
+    """Key for an image blob OCR'd with the given Tesseract parameters."""
+    digest = hashlib.sha256(blob).hexdigest()
+    return f"{digest}|{lang or ''}|{psm or ''}|{version or ''}"
+
+
+class OCRCache:
+    """SQLite-backed LRU cache mapping cache keys to (text, is_text)."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Connections are shared with the OCR worker threads; the lock
+        # serialises access. The timeout covers other processes writing.
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " is_text INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached (text, is_text) for `key`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, is_text FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE ocr SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0], bool(row[1])
+
+    def put(self, key, text, is_text):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr (key, text, is_text, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, text, int(is_text), len(key) + len(text.encode('utf-8')), time.time()))
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % _EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * _EVICT_TO)
+        rows = self._conn.execute("SELECT key, size FROM ocr ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM ocr WHERE key = ?", doomed)
+        self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr").fetchone()
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': entries, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
@@ -0,0 +1,92 @@
+"""
+ocr_prefilter.py
+
+Cheap "could this picture contain text?" check, run before Tesseract.
+
+Most pictures in a deck are photos or charts whose OCR output is thrown
+away by `is_mostly_text` anyway, after paying the full Tesseract cost.
+`text_score` looks at a small grayscale copy of the image with NumPy and
+combines three signals into a score between 0 and 1:
+
+- bimodality: text is ink on a flat background, so the luminance histogram
+  splits cleanly in two (Otsu's between-class / total variance);
+- edge density: the share of pixels on a strong luminance edge;
+- stroke statistics: the minority (ink) class of the binarised image comes
+  in many short horizontal runs for glyph strokes, and in few long ones for
+  bars, blobs and photo regions.
+
+Pictures scoring below the threshold are skipped. NumPy is optional; without
+it `ocr.load_prefilter` returns None and every picture is OCR'd.
+"""
+
+import numpy as np
+
+from ocr_preprocess import otsu as otsu_histogram
+
+# Longest side of the copy the signals are computed on
+ANALYSIS_SIZE = 512
+DEFAULT_THRESHOLD = 0.55
+
+_EDGE_STEP = 48  # luminance step (0-255) counted as an edge
+
+
+def _clip(value):
+    return float(min(1.0, max(0.0, value)))
+
+
+def luminance(image, size=ANALYSIS_SIZE):
+    """Downscaled grayscale copy of a PIL image as a float array."""
+    gray = image.convert('L')
+    if max(gray.size) > size:
+        gray = gray.copy()
+        gray.thumbnail((size, size))
+    return np.asarray(gray, dtype=np.float32)
+
+
+def otsu(lum):
+    """(threshold, between-class / total variance) of a luminance array."""
+    return otsu_histogram(np.bincount(lum.astype(np.uint8).ravel(), minlength=256).tolist())
+
+
+def signals(image):
+    """The raw signals for a PIL image, as a dict."""
+    lum = luminance(image)
+    threshold, bimodality = otsu(lum)
+
+    dx = np.abs(np.diff(lum, axis=1))
+    dy = np.abs(np.diff(lum, axis=0))
+    edges = ((dx[:-1, :] > _EDGE_STEP) | (dy[:, :-1] > _EDGE_STEP)).mean()
+
+    ink = lum <= threshold
+    if ink.mean() > 0.5:
+        # light text on a dark background
+        ink = ~ink
+    # horizontal runs of ink: count the starts of runs in every row
+    padded = np.pad(ink, ((0, 0), (1, 0)))
+    runs = int((padded[:, 1:] & ~padded[:, :-1]).sum())
+    ink_pixels = int(ink.sum())
+    return {
+        'bimodality': bimodality,
+        'edge_density': float(edges),
+        'mean_run': ink_pixels / runs if runs else 0.0,
+        'run_density': runs / ink.size,
+    }
+
+
+def text_score(image):
+    """Likelihood-like score (0-1) that a PIL image holds text worth OCR'ing."""
+    s = signals(image)
+    bimodal = _clip((s['bimodality'] - 0.6) / 0.3)
+    edges = _clip(s['edge_density'] / 0.06)
+    strokes = _clip((10 - s['mean_run']) / 7) * _clip(s['run_density'] / 0.015)
+    return (bimodal + edges + strokes) / 3
+
+
+class Prefilter:
+    """Callable telling whether a PIL image is worth sending to Tesseract."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+
+    def __call__(self, image):
+        return text_score(image) >= self.threshold
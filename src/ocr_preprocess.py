@@ -0,0 +1,140 @@
+"""
+ocr_preprocess.py
+
+Prepares picture blobs for Tesseract.
+
+Screenshots pasted into decks are often far larger than they are shown: a
+6000x4000 capture squeezed into a third of a slide still has every pixel
+sent to Tesseract. `preprocess` works from the size the picture is displayed
+at (its EMU width and height on the slide):
+
+1. Converts the image to grayscale and rescales it to an effective OCR
+   resolution (300 DPI by default) at that display size. Large images
+   shrink; small ones are enlarged at most `MAX_UPSCALE` times, since
+   Tesseract reads tiny glyphs badly.
+2. Binarises it at Otsu's threshold, so Tesseract gets clean black-on-white
+   input.
+3. Splits images taller than `TILE_HEIGHT` into horizontal strips, cutting
+   at the blankest row near each boundary so no line of text is cut in two.
+   The strips are recognised in parallel and their text is joined top to
+   bottom, which keeps the reading order.
+
+Only PIL is needed.
+"""
+
+from PIL import Image
+
+EMU_PER_INCH = 914400
+DEFAULT_DPI = 300
+MAX_UPSCALE = 2.0
+# Scale factors this close to 1 are not worth a resample
+_RESCALE_TOLERANCE = 0.1
+
+TILE_HEIGHT = 1600
+# How far (in rows) from a tile boundary to look for a blank row to cut at
+TILE_SEARCH = 200
+
+
+def scale_for(image_size, display_size, dpi=DEFAULT_DPI):
+    """Factor bringing a (width, height) image to `dpi` at its display size.
+
+    `display_size` is the shape's (cx, cy) in EMU; returns 1 when it is not
+    known.
+    """
+    if not display_size or not all(display_size):
+        return 1.0
+    scale = min(display_size[0] / EMU_PER_INCH * dpi / image_size[0],
+                display_size[1] / EMU_PER_INCH * dpi / image_size[1])
+    return min(scale, MAX_UPSCALE)
+
+
+def rescale(image, display_size, dpi=DEFAULT_DPI):
+    scale = scale_for(image.size, display_size, dpi)
+    if abs(scale - 1) < _RESCALE_TOLERANCE:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+def otsu(histogram):
+    """(threshold, between-class / total variance) of a 256-bin luminance histogram.
+
+    The threshold is the last level of the dark class; a flat image gives
+    (0, 0.0). Shared with ocr_prefilter, which uses the variance ratio as its
+    bimodality signal.
+    """
+    total = sum(histogram)
+    if not total:
+        return 0, 0.0
+    sum_total = sum(level * n for level, n in enumerate(histogram))
+    mean_total = sum_total / total
+    variance = sum(n * (level - mean_total) ** 2 for level, n in enumerate(histogram)) / total
+    if variance == 0:
+        return 0, 0.0
+    weight = 0
+    sum_below = 0
+    best, threshold = -1.0, 0
+    for level, n in enumerate(histogram):
+        weight += n
+        if weight == 0:
+            continue
+        rest = total - weight
+        if rest == 0:
+            break
+        sum_below += level * n
+        mean_below = sum_below / weight
+        mean_above = (sum_total - sum_below) / rest
+        between = weight * rest * (mean_below - mean_above) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold, best / (total * total) / variance
+
+
+def grayscale(image):
+    """'L' copy of a PIL image, with transparent areas turned white."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # transparent areas would otherwise come out black
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image)
+    return image.convert('L')
+
+
+def binarise(gray):
+    """Black text on white of a grayscale image."""
+    threshold, _ = otsu(gray.histogram())
+    binary = gray.point(lambda v: 255 if v > threshold else 0)
+    # light text on a dark background: invert, Tesseract prefers dark ink
+    if binary.histogram()[0] > binary.width * binary.height / 2:
+        binary = binary.point(lambda v: 255 - v)
+    return binary
+
+
+def _cut_rows(image, tile_height=TILE_HEIGHT, search=TILE_SEARCH):
+    """Rows to cut a binarised image at, each one as blank as possible."""
+    # mean of every row in one resample: 255 for a fully blank row
+    rows = image.resize((1, image.height), Image.BOX).tobytes()
+    cuts = []
+    start = 0
+    while image.height - start > tile_height:
+        target = start + tile_height
+        low = max(start + 1, target - search)
+        high = min(image.height - 1, target + search)
+        cut = max(range(low, high + 1), key=lambda row: (rows[row], -abs(row - target)))
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def tiles(image, tile_height=TILE_HEIGHT):
+    """Horizontal strips of `image`, top to bottom."""
+    if image.height <= tile_height:
+        return [image]
+    edges = [0] + _cut_rows(image, tile_height) + [image.height]
+    return [image.crop((0, top, image.width, bottom))
+            for top, bottom in zip(edges, edges[1:])]
+
+
+def preprocess(image, display_size=None, dpi=DEFAULT_DPI, tile_height=TILE_HEIGHT):
+    """Rescaled, binarised tiles of a PIL image, in reading order."""
+    return tiles(binarise(rescale(grayscale(image), display_size, dpi)), tile_height)
@@ -0,0 +1,433 @@
+"""
+pipeline.py
+
+Single-traversal, rule-based transform pipeline over the XML parts of a PPTX.
+
+The engine streams the package member by member (see zipstream.py). Every
+slide, layout, master and notes part that at least one rule cares about is
+parsed once with lxml, walked once with `iter()` over the union of the tags
+the rules asked for, and each element is dispatched to the rules registered
+for its tag. Parts no rule wants, and parts the rules left unchanged, are
+copied through as raw compressed bytes.
+
+In incremental mode (see incremental.py) parts whose input fingerprint is
+unchanged since the previous run are copied from the previous output.
+
+A rule may defer work on a part (e.g. until its OCR results are in). The
+part is then kept in memory and written once its deferred work has run;
+members after it are queued so the member order of the output matches the
+input. In large-deck mode parts are written as soon as they are transformed
+instead, so at most one parsed part is held at a time; a memory limit
+drains the queue the same way once it is reached.
+
+Writing a rule:
+
+    class MyRule(Rule):
+        kinds = ('slide',)            # part kinds, see PART_KINDS
+        tags = (P + 'sp',)            # elements to be visited
+
+        def visit(self, element, part):
+            ...                       # return True if the element changed
+"""
+
+import contextlib
+import os
+import posixpath
+import re
+import time
+import zipfile
+
+from lxml import etree
+
+from incremental import Manifest, part_fingerprint
+from instrument import active, count, stage
+from zipstream import copy_member, open_member
+
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PR = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+NSMAP = {
+    'a': A[1:-1],
+    'p': P[1:-1],
+    'r': R[1:-1],
+}
+
+PART_KINDS = {
+    'slide': re.compile(r'ppt/slides/slide\d+\.xml$'),
+    'layout': re.compile(r'ppt/slideLayouts/slideLayout\d+\.xml$'),
+    'master': re.compile(r'ppt/slideMasters/slideMaster\d+\.xml$'),
+    'notes': re.compile(r'ppt/notesSlides/notesSlide\d+\.xml$'),
+    'notesMaster': re.compile(r'ppt/notesMasters/notesMaster\d+\.xml$'),
+    'handoutMaster': re.compile(r'ppt/handoutMasters/handoutMaster\d+\.xml$'),
+    'presentation': re.compile(r'ppt/presentation\.xml$'),
+}
+
+_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def part_kind(name):
+    """Kind of the part stored under `name`, or None for other members."""
+    for kind, pattern in PART_KINDS.items():
+        if pattern.match(name):
+            return kind
+    return None
+
+
+def rels_name(name):
+    """Name of the relationships part belonging to part `name`."""
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, '_rels', filename + '.rels')
+
+
+def serialize(root):
+    """Serialise a part the way PowerPoint writes it."""
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def serialize_to(root, stream):
+    """Serialise a part like `serialize`, straight into a binary stream."""
+    etree.ElementTree(root).write(stream, xml_declaration=True, encoding='UTF-8',
+                                  standalone=True)
+
+
+class Rule:
+    """Base class for pipeline rules.
+
+    `kinds` are the part kinds the rule runs on and `tags` the (Clark
+    notation) element tags it wants to visit. `changes` counts the elements
+    and parts the rule modified. A rule whose result for a part depends on
+    other parts than the part and its direct relationship targets sets
+    `cross_part`; incremental mode is then turned off.
+    """
+
+    kinds = ()
+    tags = ()
+    cross_part = False
+
+    def __init__(self):
+        self.changes = 0
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def begin_part(self, part):
+        """Called before the elements of `part` are visited."""
+
+    def visit(self, element, part):
+        """Called for every element with a tag in `tags`; True if it changed."""
+        return False
+
+    def end_part(self, part):
+        """Called after the elements of `part` were visited; True if it changed."""
+        return False
+
+    def close(self):
+        """Called once when the whole package has been processed."""
+
+    def abort(self):
+        """Called instead of `close` when the run failed or was cancelled."""
+        self.close()
+
+
+class Part:
+    """An XML part being transformed, with access to its package."""
+
+    def __init__(self, info, kind, root, zin):
+        self.info = info
+        self.name = info.filename
+        self.kind = kind
+        self.root = root
+        self.changed = False
+        self._zin = zin
+        self._rels = None
+        self._deferred = []
+        self._removed = set()
+
+    @property
+    def rels(self):
+        """Relationship id -> target member name (external targets excluded)."""
+        if self._rels is None:
+            self._rels = {}
+            try:
+                data = self._zin.read(rels_name(self.name))
+            except KeyError:
+                return self._rels
+            directory = posixpath.dirname(self.name)
+            for rel in etree.fromstring(data, _PARSER).iter(PR + 'Relationship'):
+                if rel.get('TargetMode') == 'External':
+                    continue
+                target = rel.get('Target')
+                if target.startswith('/'):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join(directory, target))
+                self._rels[rel.get('Id')] = target
+        return self._rels
+
+    def read(self, name):
+        """Bytes of another member of the package."""
+        return self._zin.read(name)
+
+    def info_of(self, name):
+        """ZipInfo of another member of the package, or None."""
+        return self._zin.NameToInfo.get(name)
+
+    def load(self, name):
+        """Another XML part of the package, parsed for reading only."""
+        info = self._zin.getinfo(name)
+        root = etree.fromstring(self._zin.read(info), _PARSER)
+        return Part(info, part_kind(name), root, self._zin)
+
+    def remove(self, element):
+        """Detach `element`; its descendants are not visited any more."""
+        element.getparent().remove(element)
+        self._removed.add(element)
+        self.changed = True
+
+    def is_removed(self, element):
+        if not self._removed:
+            return False
+        if element in self._removed:
+            return True
+        return any(ancestor in self._removed for ancestor in element.iterancestors())
+
+    def defer(self, callback):
+        """Run `callback(part)` later, before the part is written."""
+        self._deferred.append(callback)
+
+    @property
+    def pending(self):
+        """True while deferred work is waiting to run."""
+        return bool(self._deferred)
+
+    def finish(self):
+        """Run the deferred work; returns True if the part changed."""
+        if self._deferred:
+            with stage('deferred'):
+                for callback in self._deferred:
+                    if callback(self):
+                        self.changed = True
+            self._deferred = []
+        return self.changed
+
+    def write(self, zout):
+        """Serialise the part into a new member of `zout`, compressing as it goes."""
+        with stage('serialize'), open_member(zout, self.info) as stream:
+            serialize_to(self.root, stream)
+
+
+def transform_part(part, rules):
+    """Walk `part` once, dispatching each element to the interested rules."""
+    dispatch = {}
+    for rule in rules:
+        for tag in rule.tags:
+            dispatch.setdefault(tag, []).append(rule)
+
+    timed = active()
+    for rule in rules:
+        rule.begin_part(part)
+    if dispatch:
+        for element in list(part.root.iter(*dispatch)):
+            for rule in dispatch[element.tag]:
+                if part.is_removed(element):
+                    break
+                if timed is None:
+                    changed = rule.visit(element, part)
+                else:
+                    start = time.perf_counter()
+                    changed = rule.visit(element, part)
+                    timed.add('rule:' + rule.name, time.perf_counter() - start)
+                if changed:
+                    rule.changes += 1
+                    part.changed = True
+    for rule in rules:
+        if rule.end_part(part):
+            rule.changes += 1
+            part.changed = True
+
+
+class Cancelled(Exception):
+    """Raised by run_pipeline when its `cancel` event is set."""
+
+
+def run_pipeline(input_pptx, output_pptx, rules, incremental_key=None,
+                 progress=None, cancel=None, selection=None, large_deck=False,
+                 memory_limit=None):
+    """Apply `rules` to every matching part of `input_pptx`.
+
+    With an `incremental_key` (a hash of everything besides the input that
+    the output depends on, see incremental.settings_key) and no cross-part
+    rules, a fingerprint manifest is kept next to the output. Parts whose fingerprint did not
+    change since the previous run are copied from the previous output
+    instead of being transformed again.
+
+    `progress(slides_done, slides_total)` is called whenever a slide has
+    been written. Setting `cancel` (a threading.Event) stops the run with
+    Cancelled between two parts.
+
+    With a `selection` (see selection.py, e.g. '40-60' or 'notes') only the
+    selected parts are parsed and transformed; all others are raw-copied.
+
+    With `large_deck`, every part is written (and released) before the next
+    one is read: deferred work such as OCR runs for one slide at a time
+    instead of overlapping with the rest of the deck. `memory_limit` (bytes,
+    see memory.py) is checked before each part is parsed; above it the parts
+    waiting on deferred work are drained first, and the run fails with
+    MemoryLimitExceeded if that is not enough. The output is the same bytes
+    either way.
+
+    The output is written to a temporary file and moved into place when
+    complete, so a failed or cancelled run leaves no partial output behind.
+    Returns {rule name: number of changes}, plus the number of reused parts
+    under 'reused' in incremental mode, and the process' high-water memory
+    in bytes under 'peak_memory' in large-deck mode or with a memory limit.
+    """
+    by_kind = {kind: [rule for rule in rules if kind in rule.kinds]
+               for kind in PART_KINDS}
+    # output queue: (source zip, info, Part or None); Parts are written once finished
+    queue = []
+    slides = [0, 0]  # done, total
+
+    def check_cancel():
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+
+    def flush(zout, force=False):
+        while queue:
+            source, info, part = queue[0]
+            check_cancel()
+            if part is not None and part.pending and not force:
+                return
+            changed = part is not None and part.finish()
+            with stage('write'):
+                if changed:
+                    part.write(zout)
+                    count('parts_rewritten')
+                else:
+                    copy_member(source, zout, info)
+            queue.pop(0)
+            if progress is not None and part_kind(info.filename) == 'slide' \
+                    and (selected is None or info.filename in selected):
+                slides[0] += 1
+                progress(*slides)
+
+    selected = None
+    previous = None
+    manifest = None
+    if incremental_key is not None and any(rule.cross_part for rule in rules):
+        print("Incremental mode is off: a rule looks across parts")
+        incremental_key = None
+    if incremental_key is not None:
+        manifest = Manifest(incremental_key)
+        digests = {}  # member name -> fingerprint, shared by the parts linking to it
+        previous = Manifest.load(output_pptx)
+        if previous is not None and (previous.key != incremental_key
+                                     or not os.path.exists(output_pptx)):
+            previous = None
+    reused = 0
+    ceiling = None
+    if memory_limit:
+        from memory import MemoryCeiling
+        ceiling = MemoryCeiling(memory_limit)
+
+    tmp_path = output_pptx + '.tmp'
+    try:
+        with contextlib.ExitStack() as stack:
+            zin = stack.enter_context(zipfile.ZipFile(input_pptx, 'r'))
+            zprev = stack.enter_context(zipfile.ZipFile(output_pptx, 'r')) if previous else None
+            zout = stack.enter_context(zipfile.ZipFile(tmp_path, 'w'))
+            if selection is not None:
+                from selection import selected_names
+                selected = selected_names(zin, selection)
+            slides[1] = sum(part_kind(name) == 'slide' and (selected is None or name in selected)
+                            for name in zin.NameToInfo)
+            count('slides', slides[1])
+            count('bytes_read', os.path.getsize(input_pptx))
+            for info in zin.infolist():
+                kind = part_kind(info.filename)
+                part_rules = by_kind.get(kind)
+                if not part_rules or (selected is not None and info.filename not in selected):
+                    queue.append((zin, info, None))
+                    flush(zout)
+                    continue
+                if manifest is not None:
+                    with stage('fingerprint'):
+                        fingerprint = part_fingerprint(zin, info, rels_name(info.filename),
+                                                       digests)
+                    manifest.parts[info.filename] = fingerprint
+                    if previous is not None:
+                        previous_info = zprev.NameToInfo.get(info.filename)
+                        if previous.reusable(info.filename, fingerprint, previous_info):
+                            queue.append((zprev, previous_info, None))
+                            reused += 1
+                            flush(zout)
+                            continue
+                if ceiling is not None and ceiling.over():
+                    # stop reading ahead until the queued parts are written
+                    flush(zout, force=True)
+                    ceiling.enforce(f"before {info.filename}")
+                with stage('parse'):
+                    root = etree.fromstring(zin.read(info), _PARSER)
+                count('parts_parsed')
+                part = Part(info, kind, root, zin)
+                with stage('rules'):
+                    transform_part(part, part_rules)
+                queue.append((zin, info, part))
+                # the queue holds the only reference, so a written part is freed
+                del part, root
+                flush(zout, force=large_deck)
+            flush(zout, force=True)
+            if manifest is not None:
+                manifest.output_crcs = {i.filename: i.CRC for i in zout.infolist()
+                                        if i.filename in manifest.parts}
+        os.replace(tmp_path, output_pptx)
+        if manifest is not None:
+            manifest.save(output_pptx)
+    except BaseException:
+        for rule in rules:
+            rule.abort()
+        raise
+    else:
+        for rule in rules:
+            rule.close()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    stats = {rule.name: rule.changes for rule in rules}
+    if manifest is not None:
+        stats['reused'] = reused
+    if large_deck or ceiling is not None:
+        from memory import peak_rss
+        stats['peak_memory'] = peak_rss()
+        count('peak_memory_bytes', stats['peak_memory'] or 0)
+    return stats
+
+
+def scan_pipeline(input_pptx, rules, selection=None):
+    """Apply `rules` to the parts of `input_pptx` in memory; nothing is written.
+
+    Used to report what a run would change. Returns {rule name: number of
+    changes} like run_pipeline. Deferred work (see Part.defer) is not run.
+    """
+    by_kind = {kind: [rule for rule in rules if kind in rule.kinds]
+               for kind in PART_KINDS}
+    with zipfile.ZipFile(input_pptx, 'r') as zin:
+        selected = None
+        if selection is not None:
+            from selection import selected_names
+            selected = selected_names(zin, selection)
+        for info in zin.infolist():
+            part_rules = by_kind.get(part_kind(info.filename))
+            if not part_rules or (selected is not None and info.filename not in selected):
+                continue
+            with stage('parse'):
+                root = etree.fromstring(zin.read(info), _PARSER)
+            part = Part(info, part_kind(info.filename), root, zin)
+            with stage('rules'):
+                transform_part(part, part_rules)
+    for rule in rules:
+        rule.close()
+    return {rule.name: rule.changes for rule in rules}
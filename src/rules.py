@@ -0,0 +1,494 @@
+"""
+rules.py
+
+The cleanups of the PowerPoint Cleaner as pipeline rules (see pipeline.py).
+
+Each rule covers one setting of the cleaner's settings dict:
+
+    NotesAbbreviationRule   abbreviation expansion in the speaker notes
+    DuplicateShapeRule      remove_duplicates, duplicate_mode
+    RunFormatRule           format_runs: custom_font, custom_font_size,
+                            text_bold, text_color, text_spacing (and
+                            remove_wordart)
+    BackgroundRule          set_background: background_color
+    OCRRule                 enable_ocr
+    OCRCandidateRule        pictures OCRRule would handle (analysis only)
+    KerningRule             run kerning reset of clean_spacing.py
+
+As in the original python-pptx implementation, the slide rules only look at
+the top-level shapes of a slide (not at shapes inside groups).
+"""
+
+import copy
+
+from lxml import etree
+
+from abbreviations import expand_text_body, frame_text
+from cleaner_options import DUPLICATE_MODES
+from duplicates import DuplicateIndex, is_placeholder, normalise_text
+from instrument import count
+from pipeline import A, NSMAP, P, R, Rule, part_kind
+
+
+# Children of a:rPr, in schema order, that must follow the fill / a:latin
+_RPR_FILLS = tuple(A + tag for tag in (
+    'noFill', 'solidFill', 'gradFill', 'blipFill', 'pattFill', 'grpFill'))
+_RPR_AFTER_FILL = tuple(A + tag for tag in (
+    'effectLst', 'effectDag', 'highlight', 'uLnTx', 'uLn', 'uFillTx', 'uFill',
+    'latin', 'ea', 'cs', 'sym', 'hlinkClick', 'hlinkMouseOver', 'rtl', 'extLst'))
+_RPR_AFTER_LATIN = tuple(A + tag for tag in (
+    'ea', 'cs', 'sym', 'hlinkClick', 'hlinkMouseOver', 'rtl', 'extLst'))
+
+
+def color_hex(color):
+    """'RRGGBB' for an RGBColor or a hex string such as '#ff0000'."""
+    return str(color).lstrip('#').upper()
+
+
+def insert_before(parent, child, successors):
+    """Insert `child` before the first child of `parent` tagged in `successors`."""
+    for element in parent.iterchildren(*successors):
+        element.addprevious(child)
+        return
+    parent.append(child)
+
+
+def set_attr(element, name, value):
+    """Set an attribute; True if that changed anything."""
+    if element.get(name) == value:
+        return False
+    element.set(name, value)
+    return True
+
+
+def get_or_add_rPr(r):
+    rPr = r.find(A + 'rPr')
+    if rPr is None:
+        rPr = etree.Element(A + 'rPr')
+        r.insert(0, rPr)
+    return rPr
+
+
+# Placeholder types whose text inherits the master's title or body style
+TEXT_STYLE_PLACEHOLDERS = ('title', 'ctrTitle', 'subTitle', 'body', 'obj')
+
+
+def inherits_text_style(shape):
+    """True for a title, body or content placeholder."""
+    ph = shape.find('p:nvSpPr/p:nvPr/p:ph', NSMAP)
+    return ph is not None and ph.get('type', 'obj') in TEXT_STYLE_PLACEHOLDERS
+
+
+def is_top_level(shape):
+    return shape.getparent().tag == P + 'spTree'
+
+
+def shape_name(shape):
+    cNvPr = shape.find('*/p:cNvPr', NSMAP)
+    return cNvPr.get('name', '') if cNvPr is not None else ''
+
+
+class RunFormat:
+    """Run formatting requested by the settings, applied to a:rPr elements.
+
+    The target a:rPr is built once (`template`). Runs are picked with one
+    compiled XPath per text body that only returns the runs not matching it
+    yet, so runs that are already formatted cost no per-attribute work;
+    runs without an a:rPr get a copy of the template.
+    """
+
+    def __init__(self, settings):
+        self.attrib = {}
+        self.typeface = None
+        if settings['enable_custom_font'] and settings['custom_font']:
+            self.typeface = settings['custom_font']
+            # Length in EMU -> hundredths of a point
+            self.attrib['sz'] = str(int(settings['custom_font_size']) // 127)
+        self.attrib['b'] = '1' if settings['text_bold'] else '0'
+        # Character spacing is set in space-per-100 units
+        self.attrib['spc'] = str(settings['text_spacing'])
+        self.color = color_hex(settings['text_color'])
+
+        self.template = etree.Element(A + 'rPr')
+        self.apply(self.template)
+        self._variables = dict(self.attrib, color=self.color, typeface=self.typeface or '')
+        fills = ' or '.join('self::' + tag.replace(A, 'a:') for tag in _RPR_FILLS)
+        matches = [f"@{name}=${name}" for name in self.attrib]
+        matches.append(f"*[{fills}][1][self::a:solidFill][count(*)=1]"
+                       f"/a:srgbClr[@val=$color][not(*)]")
+        # properties a run may inherit instead of setting them itself
+        # (hyperlinks count: they would take the theme's hyperlink color)
+        overrides = [f"@{name}" for name in self.attrib] + [f"*[{fills}]", "a:hlinkClick"]
+        if self.typeface:
+            matches.append("a:latin/@typeface=$typeface")
+            overrides.append("a:latin")
+        match = ' and '.join(matches)
+        self._unformatted = etree.XPath(f".//a:r[not(a:rPr[{match}])]", namespaces=NSMAP)
+        self._overriding = etree.XPath(
+            f".//a:r[a:rPr[{' or '.join(overrides)}]][not(a:rPr[{match}])]", namespaces=NSMAP)
+
+    def apply(self, rPr):
+        """Format one a:rPr (or a:defRPr); True if it changed."""
+        changed = False
+        for name, value in self.attrib.items():
+            changed |= set_attr(rPr, name, value)
+
+        fill = None
+        for element in rPr.iterchildren(*_RPR_FILLS):
+            fill = element
+            break
+        srgb = fill[0] if fill is not None and len(fill) else None
+        if (fill is None or fill.tag != A + 'solidFill' or len(fill) != 1
+                or srgb.tag != A + 'srgbClr' or srgb.get('val') != self.color
+                or len(srgb)):
+            if fill is not None:
+                rPr.remove(fill)
+            fill = etree.Element(A + 'solidFill')
+            etree.SubElement(fill, A + 'srgbClr', val=self.color)
+            insert_before(rPr, fill, _RPR_AFTER_FILL)
+            changed = True
+
+        if self.typeface:
+            latin = rPr.find(A + 'latin')
+            if latin is None:
+                latin = etree.Element(A + 'latin')
+                insert_before(rPr, latin, _RPR_AFTER_LATIN)
+            changed |= set_attr(latin, 'typeface', self.typeface)
+        return changed
+
+    def apply_to_runs(self, txBody, inherited=False):
+        """Format every run of a text body; returns the number of runs changed.
+
+        With `inherited`, runs that set none of the formatted properties
+        themselves are left alone: they get them from the patched defaults
+        (see RunFormatRule).
+        """
+        runs = (self._overriding if inherited else self._unformatted)(txBody, **self._variables)
+        for r in runs:
+            rPr = r.find(A + 'rPr')
+            if rPr is None:
+                r.insert(0, copy.deepcopy(self.template))
+            elif not len(rPr):
+                # attributes only: take the template's children as they are
+                rPr.attrib.update(self.attrib)
+                rPr.extend(copy.deepcopy(child) for child in self.template)
+            else:
+                self.apply(rPr)
+        return len(runs)
+
+
+class NotesAbbreviationRule(Rule):
+    """Expand abbreviations in the speaker notes, editing matching runs in place."""
+
+    kinds = ('notes',)
+    tags = (P + 'txBody',)
+
+    def __init__(self, expander):
+        super().__init__()
+        self.expander = expander
+        self.expansions = 0  # abbreviations expanded; `changes` counts text bodies
+        self.skipped = 0
+
+    def visit(self, txBody, part):
+        expanded = expand_text_body(self.expander, txBody)
+        if expanded:
+            self.expansions += expanded
+            return True
+        self.skipped += 1
+        return False
+
+
+class DuplicateShapeRule(Rule):
+    """Remove textboxes and pictures that duplicate others (see duplicates.py).
+
+    Modes:
+        slide   text already on the same slide (anywhere), or a picture
+                already at the same place on it
+        deck    text or a picture already at the same place on an earlier slide
+        layout  text or a picture the slide's layout or master already shows
+                at the same place
+
+    Placeholders and empty textboxes are only removed in 'slide' mode.
+    """
+
+    kinds = ('slide',)
+    tags = (P + 'sp', P + 'pic')
+
+    def __init__(self, mode='slide'):
+        if mode not in DUPLICATE_MODES:
+            raise ValueError(f"unknown duplicate mode {mode!r}")
+        super().__init__()
+        self.mode = mode
+        # deck and layout results depend on other parts than the slide itself
+        self.cross_part = mode != 'slide'
+        self.texts = DuplicateIndex(use_geometry=mode != 'slide')
+        self.pictures = DuplicateIndex(use_geometry=True) if mode == 'slide' else self.texts
+        self._layouts = {}
+
+    def begin_part(self, part):
+        if self.mode == 'slide':
+            self.texts.clear()
+            self.pictures.clear()
+        elif self.mode == 'layout':
+            self.texts = self.pictures = self.layout_index(part)
+
+    def layout_index(self, part):
+        """Index of the shapes the layout and master of slide `part` show."""
+        layout = next((t for t in part.rels.values() if part_kind(t) == 'layout'), None)
+        if layout is None or part.root.get('showMasterSp') == '0':
+            return DuplicateIndex(use_geometry=True)
+        if layout not in self._layouts:
+            index = DuplicateIndex(use_geometry=True)
+            sources = [part.load(layout)]
+            master = next((t for t in sources[0].rels.values() if part_kind(t) == 'master'), None)
+            if master is not None and sources[0].root.get('showMasterSp') != '0':
+                sources.append(part.load(master))
+            for source in sources:
+                for shape in source.root.iterfind('p:cSld/p:spTree/*', NSMAP):
+                    if shape.tag in self.tags and not is_placeholder(shape):
+                        index.add(index.key(shape, source, _shape_text(shape)))
+            self._layouts[layout] = index
+        return self._layouts[layout]
+
+    def visit(self, shape, part):
+        if not is_top_level(shape):
+            return False
+        text = _shape_text(shape)
+        if shape.tag == P + 'sp':
+            if text is None:
+                return False
+            index = self.texts
+        else:
+            index = self.pictures
+        if self.mode != 'slide' and (is_placeholder(shape) or text is not None and not normalise_text(text)):
+            return False
+        key = index.key(shape, part, text)
+        if self.mode == 'layout':
+            duplicate = index.seen(key, part)
+        else:
+            duplicate = index.check(key, part)
+        if duplicate:
+            part.remove(shape)
+            count('duplicates_removed')
+        return duplicate
+
+
+def _shape_text(shape):
+    txBody = shape.find(P + 'txBody')
+    return frame_text(txBody) if txBody is not None else None
+
+
+class RunFormatRule(Rule):
+    """Apply font, size, bold, color and spacing to the runs of slide shapes.
+
+    With `push_defaults` the formatting is also written into the text
+    defaults that title and body placeholders inherit: the title and body
+    styles of the masters and the list styles of their placeholders and of
+    the layout placeholders. Runs in slide placeholders that do not override
+    those properties then need no a:rPr changes at all. Only use it when
+    every layout and master goes through the pipeline (not with a slide
+    selection).
+    """
+
+    kinds = ('slide',)
+    tags = (P + 'sp',)
+
+    def __init__(self, run_format, remove_wordart=False, push_defaults=False):
+        super().__init__()
+        self.run_format = run_format
+        self.remove_wordart = remove_wordart
+        self.push_defaults = push_defaults
+        if push_defaults:
+            self.kinds = ('slide', 'layout', 'master')
+
+    def visit(self, sp, part):
+        txBody = sp.find(P + 'txBody')
+        if txBody is None:
+            return False
+        if part.kind != 'slide':
+            if not inherits_text_style(sp):
+                return False
+            return self.patch_defaults(txBody.iterfind('a:lstStyle/*/a:defRPr', NSMAP))
+        if not is_top_level(sp):
+            return False
+        if "WordArt" in shape_name(sp) and not self.remove_wordart:
+            return False
+        inherited = (self.push_defaults and inherits_text_style(sp)
+                     and txBody.find('.//' + A + 'defRPr') is None)
+        runs = self.run_format.apply_to_runs(txBody, inherited)
+        count('runs_touched', runs)
+        return runs > 0
+
+    def end_part(self, part):
+        if part.kind != 'master':
+            return False
+        return self.patch_defaults(part.root.xpath(
+            'p:txStyles/p:titleStyle/*/a:defRPr | p:txStyles/p:bodyStyle/*/a:defRPr',
+            namespaces=NSMAP))
+
+    def patch_defaults(self, defRPrs):
+        changed = 0
+        for defRPr in defRPrs:
+            changed += self.run_format.apply(defRPr)
+        count('defaults_patched', changed)
+        return changed > 0
+
+
+class BackgroundRule(Rule):
+    """Give every slide a solid background color."""
+
+    kinds = ('slide',)
+    tags = (P + 'cSld',)
+
+    def __init__(self, color):
+        super().__init__()
+        self.color = color_hex(color)
+
+    def visit(self, cSld, part):
+        bg = cSld.find(P + 'bg')
+        srgb = bg.find('p:bgPr/a:solidFill/a:srgbClr', NSMAP) if bg is not None else None
+        if srgb is not None and srgb.get('val') == self.color and not len(srgb):
+            return False
+        if bg is not None:
+            cSld.remove(bg)
+        bg = etree.Element(P + 'bg')
+        bgPr = etree.SubElement(bg, P + 'bgPr')
+        fill = etree.SubElement(bgPr, A + 'solidFill')
+        etree.SubElement(fill, A + 'srgbClr', val=self.color)
+        etree.SubElement(bgPr, A + 'effectLst')
+        cSld.insert(0, bg)
+        return True
+
+
+def next_shape_id(root):
+    """An unused shape id for the part rooted at `root`."""
+    ids = [int(e.get('id')) for e in root.iter(P + 'cNvPr') if e.get('id', '').isdigit()]
+    return max(ids, default=0) + 1
+
+
+def new_textbox(shape_id, xfrm, text):
+    """A p:sp textbox like python-pptx's add_textbox, holding `text`."""
+    sp = etree.Element(P + 'sp', nsmap=NSMAP)
+    nvSpPr = etree.SubElement(sp, P + 'nvSpPr')
+    etree.SubElement(nvSpPr, P + 'cNvPr', id=str(shape_id), name=f"TextBox {shape_id - 1}")
+    etree.SubElement(nvSpPr, P + 'cNvSpPr', txBox='1')
+    etree.SubElement(nvSpPr, P + 'nvPr')
+    spPr = etree.SubElement(sp, P + 'spPr')
+    new_xfrm = etree.SubElement(spPr, A + 'xfrm')
+    etree.SubElement(new_xfrm, A + 'off', x=xfrm.find(A + 'off').get('x'), y=xfrm.find(A + 'off').get('y'))
+    etree.SubElement(new_xfrm, A + 'ext', cx=xfrm.find(A + 'ext').get('cx'), cy=xfrm.find(A + 'ext').get('cy'))
+    geom = etree.SubElement(spPr, A + 'prstGeom', prst='rect')
+    etree.SubElement(geom, A + 'avLst')
+    etree.SubElement(spPr, A + 'noFill')
+    txBody = etree.SubElement(sp, P + 'txBody')
+    bodyPr = etree.SubElement(txBody, A + 'bodyPr', wrap='none')
+    etree.SubElement(bodyPr, A + 'spAutoFit')
+    etree.SubElement(txBody, A + 'lstStyle')
+    p = etree.SubElement(txBody, A + 'p')
+    for i, line in enumerate(text.split('\n')):
+        if i:
+            etree.SubElement(p, A + 'br')
+        r = etree.SubElement(p, A + 'r')
+        etree.SubElement(r, A + 'rPr', lang='en-US', dirty='0')
+        etree.SubElement(r, A + 't').text = line
+    return sp
+
+
+def ocr_target(pic, part):
+    """(image member name, a:xfrm) of a picture OCRRule handles, or None.
+
+    Only plain top-level pictures are OCR'd, not picture placeholders.
+    """
+    if not is_top_level(pic) or pic.find('p:nvPicPr/p:nvPr/p:ph', NSMAP) is not None:
+        return None
+    blip = pic.find('p:blipFill/a:blip', NSMAP)
+    xfrm = pic.find('p:spPr/a:xfrm', NSMAP)
+    if blip is None or xfrm is None:
+        return None
+    name = part.rels.get(blip.get(R + 'embed'))
+    if name is None:
+        return None
+    return name, xfrm
+
+
+class OCRRule(Rule):
+    """Replace pictures that are mostly text by a textbox holding their OCR text.
+
+    Picture blobs are handed to the OCR engine as soon as a slide is parsed;
+    the replacement is deferred until the result is in, so the rest of the
+    deck is processed while OCR runs.
+    """
+
+    kinds = ('slide',)
+    tags = (P + 'pic',)
+
+    def __init__(self, ocr_engine, run_format):
+        super().__init__()
+        self.ocr_engine = ocr_engine
+        self.run_format = run_format
+
+    def visit(self, pic, part):
+        target = ocr_target(pic, part)
+        if target is None:
+            return False
+        name, xfrm = target
+        ext = xfrm.find('a:ext', NSMAP)
+        display_size = None if ext is None else (int(ext.get('cx', 0)), int(ext.get('cy', 0)))
+        count('images_submitted')
+        try:
+            future = self.ocr_engine.submit(part.read(name), display_size)
+        except Exception as e:
+            print("Error processing image for OCR:", e)
+            return False
+        part.defer(lambda part: self.replace_picture(pic, xfrm, future, part))
+        return False
+
+    def replace_picture(self, pic, xfrm, future, part):
+        try:
+            ocr_text, mostly_text = future.result()
+        except Exception as e:
+            print("Error processing image for OCR:", e)
+            return False
+        if not mostly_text:
+            return False
+        sp = new_textbox(next_shape_id(part.root), xfrm, ocr_text)
+        self.run_format.apply_to_runs(sp.find(P + 'txBody'))
+        spTree = pic.getparent()
+        insert_before(spTree, sp, (P + 'extLst',))
+        part.remove(pic)
+        self.changes += 1
+        return True
+
+    def close(self):
+        self.ocr_engine.close()
+
+    def abort(self):
+        self.ocr_engine.close(cancel=True)
+
+
+class OCRCandidateRule(Rule):
+    """Count the pictures OCRRule would send to OCR, without touching them."""
+
+    kinds = ('slide',)
+    tags = (P + 'pic',)
+
+    def visit(self, pic, part):
+        if ocr_target(pic, part) is not None:
+            self.changes += 1
+        return False
+
+
+class KerningRule(Rule):
+    """Reset run-level kerning (kern="0") in the text of slide shapes."""
+
+    kinds = ('slide',)
+    tags = (P + 'sp',)
+
+    def visit(self, sp, part):
+        txBody = sp.find(P + 'txBody')
+        if txBody is None or not is_top_level(sp):
+            return False
+        changed = False
+        for r in txBody.iter(A + 'r'):
+            changed |= set_attr(get_or_add_rPr(r), 'kern', '0')
+        return changed
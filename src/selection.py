@@ -0,0 +1,134 @@
+"""
+selection.py
+
+Choosing which parts of a deck a tool works on.
+
+A selection is written as a comma-separated list of:
+
+- slide numbers and ranges, e.g. `40-60`, `3`, `12-` (to the end). Slides
+  are numbered in presentation order, as PowerPoint shows them, not by their
+  part names. Each selected slide brings its notes slide along;
+- `notes`: every notes slide and the notes master;
+- `masters`: every slide master and layout (and the handout master).
+
+Tokens add up, so `1-3,masters` is the first three slides plus the masters.
+The tools parse and transform only the selected parts; everything else is
+copied through as raw compressed bytes.
+"""
+
+import argparse
+import re
+
+from lxml import etree
+
+from pipeline import NSMAP, R, Part, part_kind
+
+_RANGE_RE = re.compile(r'^(\d+)(?:(-)(\d*))?$')
+KEYWORDS = ('notes', 'masters')
+MASTER_KINDS = ('master', 'layout', 'handoutMaster')
+NOTES_KINDS = ('notes', 'notesMaster')
+
+
+class Selection:
+    """Parsed selection; `resolve(zin)` gives the selected part names."""
+
+    def __init__(self, ranges=(), notes=False, masters=False):
+        self.ranges = tuple(ranges)  # (first, last) slide numbers, last None = to the end
+        self.notes = notes
+        self.masters = masters
+
+    def __str__(self):
+        tokens = [str(first) if first == last else f"{first}-{last or ''}"
+                  for first, last in self.ranges]
+        tokens += [word for word in KEYWORDS if getattr(self, word)]
+        return ','.join(tokens)
+
+    def __repr__(self):
+        return f"Selection({str(self)!r})"
+
+    def wants_slide(self, number):
+        return any(first <= number and (last is None or number <= last)
+                   for first, last in self.ranges)
+
+    def resolve(self, zin):
+        """Names of the selected parts in the open package `zin`."""
+        names = set()
+        kinds = (NOTES_KINDS if self.notes else ()) + (MASTER_KINDS if self.masters else ())
+        if kinds:
+            names.update(name for name in zin.NameToInfo if part_kind(name) in kinds)
+        if self.ranges:
+            for number, slide in enumerate(slide_order(zin), 1):
+                if self.wants_slide(number):
+                    names.add(slide)
+                    notes = notes_of(zin, slide)
+                    if notes is not None:
+                        names.add(notes)
+        return names
+
+
+def parse_selection(spec):
+    """Selection for a spec such as '40-60,notes'; None for an empty spec."""
+    if spec is None or isinstance(spec, Selection):
+        return spec
+    ranges = []
+    words = set()
+    for token in spec.replace(' ', '').lower().split(','):
+        if not token:
+            continue
+        if token in KEYWORDS:
+            words.add(token)
+            continue
+        match = _RANGE_RE.match(token)
+        if match is None:
+            raise ValueError(f"Invalid slide selection {token!r}: use ranges like 3-7, "
+                             f"'notes' or 'masters'")
+        first = int(match.group(1))
+        last = first if not match.group(2) else (int(match.group(3)) if match.group(3) else None)
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid slide range {token!r}")
+        ranges.append((first, last))
+    if not ranges and not words:
+        return None
+    return Selection(ranges, 'notes' in words, 'masters' in words)
+
+
+def _load(zin, name):
+    info = zin.getinfo(name)
+    return Part(info, part_kind(name), etree.fromstring(zin.read(info)), zin)
+
+
+def slide_order(zin):
+    """Slide part names in presentation order."""
+    presentation = _load(zin, 'ppt/presentation.xml')
+    return [presentation.rels[sld_id.get(R + 'id')]
+            for sld_id in presentation.root.iterfind('p:sldIdLst/p:sldId', NSMAP)
+            if sld_id.get(R + 'id') in presentation.rels]
+
+
+def notes_of(zin, slide):
+    """Name of the notes slide of `slide`, or None."""
+    slide_part = Part(zin.getinfo(slide), 'slide', None, zin)
+    for target in slide_part.rels.values():
+        if part_kind(target) == 'notes':
+            return target
+    return None
+
+
+def selected_names(zin, selection):
+    """Selected part names of `zin`, or None when everything is selected."""
+    selection = parse_selection(selection)
+    return None if selection is None else selection.resolve(zin)
+
+
+def _selection_argument(spec):
+    try:
+        return parse_selection(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_argument(parser):
+    """Add --slides to an argparse parser."""
+    parser.add_argument("--slides", type=_selection_argument, metavar="SPEC",
+                        help="Only process these parts: slide ranges such as 1-5,9 or 12-, "
+                             "'notes' and/or 'masters' (default: everything)")
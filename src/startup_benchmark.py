@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+startup_benchmark.py
+
+Usage:
+    python startup_benchmark.py [--runs N] [--command CMD ...] [--drop-caches]
+                                [--output results.json]
+    python startup_benchmark.py --compare before.json after.json
+
+Measures the time from launching the cleaner GUI to its first drawn window:
+1. Starts the app (`python cleaner.py` by default, or a frozen build given
+   with --command, e.g. dist/cleaner_fast/cleaner) with
+   CLEANER_STARTUP_PROBE set. The app then writes the time its window was
+   first drawn to a file and quits instead of waiting for the user.
+2. The first launch is the cold one: for `python cleaner.py` it gets an
+   empty bytecode cache, and with --drop-caches (Linux, as root) the page
+   cache is dropped first so files are read from disk again. The next
+   --runs launches are warm.
+3. Writes the cold time and the warm times (with their median) as JSON,
+   which --compare can put side by side for two builds or commits.
+
+Needs a display, like the app itself.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import git_commit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COMMAND = [sys.executable, os.path.join(HERE, 'cleaner.py')]
+TIMEOUT = 120
+
+
+def drop_caches():
+    """Drop the Linux page cache; False if that is not allowed here."""
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def launch(command, env=None):
+    """Seconds from starting `command` to its first drawn window."""
+    fd, probe = tempfile.mkstemp(prefix='cleaner_startup_', suffix='.txt')
+    os.close(fd)
+    os.remove(probe)
+    env = dict(os.environ if env is None else env, CLEANER_STARTUP_PROBE=probe)
+    try:
+        start = time.time()
+        result = subprocess.run(command, env=env, timeout=TIMEOUT,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if not os.path.exists(probe):
+            error = result.stderr.decode(errors='replace').strip().splitlines()
+            raise RuntimeError(f"no window was drawn (exit code {result.returncode}): "
+                               f"{error[-1] if error else ''}")
+        with open(probe) as f:
+            return float(f.read()) - start
+    finally:
+        if os.path.exists(probe):
+            os.remove(probe)
+
+
+def measure(command, runs, cold_caches=False):
+    env = dict(os.environ)
+    pycache = None
+    if command == DEFAULT_COMMAND:
+        # a fresh bytecode cache, so the cold run compiles like a first install
+        pycache = tempfile.mkdtemp(prefix='cleaner_pycache_')
+        env['PYTHONPYCACHEPREFIX'] = pycache
+    try:
+        dropped = drop_caches() if cold_caches else False
+        if cold_caches and not dropped:
+            print("⚠️  Cannot drop the page cache here; the cold run may be warm", file=sys.stderr)
+        cold = launch(command, env)
+        print(f"cold: {cold:.3f}s", file=sys.stderr)
+        warm = []
+        for i in range(runs):
+            warm.append(launch(command, env))
+            print(f"warm {i + 1}: {warm[-1]:.3f}s", file=sys.stderr)
+    finally:
+        if pycache is not None:
+            shutil.rmtree(pycache, ignore_errors=True)
+    return {
+        'command': command,
+        'page_cache_dropped': dropped,
+        'cold_s': cold,
+        'warm_s': warm,
+        'warm_s_median': statistics.median(warm) if warm else None,
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)['result']
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)['result']
+    for key in ('cold_s', 'warm_s_median'):
+        a, b = before[key], after[key]
+        change = f" ({(b - a) / a:+.1%})" if a and b is not None else ""
+        print(f"{key:>14}: {a:.3f}s -> {b:.3f}s{change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the time to the cleaner's first window")
+    parser.add_argument("--runs", type=int, default=5, help="Warm launches after the cold one")
+    parser.add_argument("--command", nargs="+", default=DEFAULT_COMMAND,
+                        help="Command starting the app (default: python cleaner.py)")
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="Drop the page cache before the cold launch (Linux, root)")
+    parser.add_argument("--output", "-o", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'result': measure(args.command, args.runs, args.drop_caches),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+synthetic_deck.py
+
+Usage:
+    python synthetic_deck.py output.pptx [--slides N] [--runs N] [...]
+
+Builds a synthetic PPTX with python-pptx for benchmarking the cleaner and
+the spc tools. Everything is driven by a seeded random generator, so the
+same parameters always give the same deck. Run with --help for the knobs:
+slide count, paragraphs per textbox, runs per paragraph, notes length,
+images per slide and their size, and the ratio of duplicated textboxes.
+
+Runs get a non-zero spc so the spacing tools have work to do, and the notes
+are sprinkled with the abbreviations the cleaner expands.
+"""
+
+import argparse
+import io
+import random
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Emu, Inches, Pt
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+         "eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+NOTES_WORDS = WORDS + ['pt', 'pte', 'pten', 'knn', 'vr', 'bvb', 'wrs', 'versch', 'wilt']
+
+
+def random_image(rng, width, height):
+    """PNG bytes of a noisy image that does not compress away."""
+    image = Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+    stream = io.BytesIO()
+    image.save(stream, 'PNG')
+    return stream.getvalue()
+
+
+def sentence(rng, words, count):
+    return ' '.join(rng.choice(words) for _ in range(count))
+
+
+def generate_deck(output_path, slides=50, textboxes=4, paragraphs=3, runs=4,
+                  notes_words=60, images=1, image_size=(640, 480),
+                  duplicate_ratio=0.2, seed=0):
+    """Write a synthetic deck to `output_path` and return the path."""
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[5]  # title only
+    # a few distinct images, reused like logos and screenshots in real decks
+    blobs = [random_image(rng, *image_size) for _ in range(max(1, min(images, 8)))]
+
+    for index in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {index + 1}: {sentence(rng, WORDS, 4)}"
+        texts = []
+        for box in range(textboxes):
+            if texts and rng.random() < duplicate_ratio:
+                content = rng.choice(texts)
+            else:
+                content = [[sentence(rng, WORDS, 3) for _ in range(runs)]
+                           for _ in range(paragraphs)]
+            texts.append(content)
+            top = Inches(1.5) + box * Inches(1.2)
+            tf = slide.shapes.add_textbox(Inches(0.5), top, Inches(5), Inches(1)).text_frame
+            for p_index, run_texts in enumerate(content):
+                paragraph = tf.paragraphs[0] if p_index == 0 else tf.add_paragraph()
+                for text in run_texts:
+                    run = paragraph.add_run()
+                    run.text = text + ' '
+                    run.font.size = Pt(rng.choice((14, 18, 24)))
+                    run.font._rPr.set('spc', str(rng.choice((-50, 30, 120))))
+        for i in range(images):
+            left = Inches(6) + Emu(i * 9144)
+            slide.shapes.add_picture(io.BytesIO(rng.choice(blobs)), left, Inches(1.5),
+                                     width=Inches(3))
+        if notes_words:
+            slide.notes_slide.notes_text_frame.text = sentence(rng, NOTES_WORDS, notes_words)
+
+    prs.save(output_path)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic PPTX for benchmarks")
+    parser.add_argument("output", help="Path of the deck to write")
+    parser.add_argument("--slides", type=int, default=50)
+    parser.add_argument("--textboxes", type=int, default=4, help="Textboxes per slide")
+    parser.add_argument("--paragraphs", type=int, default=3, help="Paragraphs per textbox")
+    parser.add_argument("--runs", type=int, default=4, help="Runs per paragraph")
+    parser.add_argument("--notes-words", type=int, default=60, help="Words of speaker notes per slide")
+    parser.add_argument("--images", type=int, default=1, help="Pictures per slide")
+    parser.add_argument("--image-size", default="640x480", help="Picture size in pixels, WxH")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2,
+                        help="Chance that a textbox repeats an earlier one on the slide")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    generate_deck(args.output, args.slides, args.textboxes, args.paragraphs, args.runs,
+                  args.notes_words, args.images, (width, height), args.duplicate_ratio,
+                  args.seed)
+    print(f"Synthetic deck written to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+watch.py
+
+Usage:
+    python watch.py [--tool cleaner] [--output-dir DIR] [--workers N]
+                    [--settle SECONDS] [--poll] [--port 8765]
+                    [--token-file FILE] dirs ...
+
+Service mode: cleans decks as they land in one or more folders.
+1. Watches the given directories (not their subdirectories) with inotify on
+   Linux, or by polling them every second elsewhere or with --poll. Decks
+   already there on start-up are picked up too, unless their output is
+   newer than they are.
+2. Debounces files that are still being written: a deck is only queued once
+   its size and modification time have not changed for --settle seconds.
+   A deck that is changed again later is queued again.
+3. Runs the jobs on a pool of worker processes that import the tool (and so
+   lxml/python-pptx) once, when they start, instead of once per deck.
+4. Writes every output to a hidden temporary file next to it and renames it
+   into place when the tool is done, so nothing ever sees half a deck.
+5. Serves a small JSON API on 127.0.0.1 (--port, 0 to turn it off):
+       POST /jobs        {"input": "deck.pptx"}
+       GET  /jobs        every job and its status
+       GET  /jobs/<id>   one job: queued, running, done or failed
+   Every request needs an `Authorization: Bearer <token>` header. The token
+   is read from PPT_CLEANER_WATCH_TOKEN or --token-file; a file that does
+   not exist yet is created with a random token, readable by the owner
+   only. POST needs `Content-Type: application/json`, and only queues decks
+   in the watched directories; the output goes where a watched deck's
+   would.
+6. A worker process that dies (out of memory, a crash in lxml or
+   Tesseract) fails its job; the pool is then started again.
+
+Tools are those of batch.py. Stop the service with Ctrl+C.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import hmac
+import importlib
+import itertools
+import json
+import os
+import secrets
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch import TOOLS, _is_deck, output_path_for, run_one
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_PORT = 8765
+POLL_INTERVAL = 1.0
+MAX_BODY = 64 * 1024
+
+# inotify(7) event bits
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+class InotifyWatcher:
+    """Reports paths written to or moved into the watched directories."""
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, dirs):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        for directory in dirs:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self.dirs[wd] = directory
+
+    def wait(self, timeout):
+        """Paths with events within `timeout` seconds (maybe none)."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name and wd in self.dirs:
+                paths.append(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher: lists the directories every `interval` seconds."""
+
+    def __init__(self, dirs, interval=POLL_INTERVAL):
+        self.dirs = list(dirs)
+        self.interval = interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return list(scan(self.dirs))
+
+    def close(self):
+        pass
+
+
+def open_watcher(dirs, poll=False):
+    if not poll:
+        try:
+            return InotifyWatcher(dirs)
+        except (OSError, AttributeError, TypeError) as e:
+            print(f"⚠️  inotify unavailable ({e}); polling instead", file=sys.stderr)
+    return PollingWatcher(dirs)
+
+
+def scan(dirs):
+    """Decks currently in `dirs`."""
+    for directory in dirs:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and _is_deck(entry.path):
+                    yield entry.path
+
+
+def signature(path):
+    """(size, mtime) of a file, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class Debouncer:
+    """Holds paths back until they have not changed for `settle` seconds."""
+
+    def __init__(self, settle=DEFAULT_SETTLE):
+        self.settle = settle
+        self.pending = {}  # path -> (signature, unchanged since)
+
+    def touch(self, path, now):
+        sig = signature(path)
+        if sig is None:
+            self.pending.pop(path, None)
+        elif path not in self.pending or self.pending[path][0] != sig:
+            self.pending[path] = (sig, now)
+
+    def ready(self, now):
+        """Paths that settled, with their signature."""
+        settled = []
+        for path, (sig, since) in list(self.pending.items()):
+            current = signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != sig:
+                self.pending[path] = (current, now)
+            elif now - since >= self.settle:
+                del self.pending[path]
+                settled.append((path, sig))
+        return settled
+
+
+def final_output(tool, input_pptx, output_dir=None):
+    """Where the output of `input_pptx` ends up."""
+    if output_dir:
+        return output_path_for(tool, input_pptx, output_dir)
+    base, ext = os.path.splitext(input_pptx)
+    return f"{base}{TOOLS[tool][2]}{ext}"
+
+
+def is_up_to_date(input_pptx, output_pptx):
+    try:
+        return os.path.getmtime(output_pptx) >= os.path.getmtime(input_pptx)
+    except OSError:
+        return False
+
+
+def _warm_up(tool):
+    """Worker initializer: import the tool and its libraries once."""
+    importlib.import_module(TOOLS[tool][0])
+
+
+def run_job(tool, input_pptx, output_pptx):
+    """Run `tool` into a temporary file and move it to `output_pptx` when done.
+
+    Same return value as batch.run_one.
+    """
+    directory, name = os.path.split(output_pptx)
+    tmp_path = os.path.join(directory, f".{name}.partial")
+    result = run_one(tool, input_pptx, tmp_path)
+    if result[2] is None:
+        os.replace(tmp_path, output_pptx)
+        return result[0], output_pptx, None, result[3]
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return result
+
+
+class JobQueue:
+    """Jobs submitted to the worker pool, by id."""
+
+    def __init__(self, tool, workers=None, output_dir=None):
+        self.tool = tool
+        self.output_dir = output_dir
+        self.jobs = {}
+        self._futures = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._workers = workers
+        self._pool = self._start_pool()
+
+    def _start_pool(self):
+        return ProcessPoolExecutor(max_workers=self._workers, initializer=_warm_up,
+                                   initargs=(self.tool,))
+
+    def _restart_pool(self, broken):
+        """Replace the pool `broken` after one of its workers died."""
+        with self._lock:
+            if self._pool is not broken:
+                return  # another job of the same pool got here first
+            self._pool = self._start_pool()
+        print("⚠️  A worker process died; restarted the worker pool", file=sys.stderr)
+        broken.shutdown(wait=False)
+
+    def submit(self, input_pptx):
+        """Queue a deck; returns its job dict."""
+        input_pptx = os.path.abspath(input_pptx)
+        output_pptx = os.path.abspath(final_output(self.tool, input_pptx, self.output_dir))
+        with self._lock:
+            job = {'id': next(self._ids), 'input': input_pptx, 'output': output_pptx,
+                   'status': 'queued', 'error': None, 'seconds': None,
+                   'submitted': time.time()}
+            self.jobs[job['id']] = job
+        pool = self._pool
+        try:
+            future = pool.submit(run_job, self.tool, input_pptx, output_pptx)
+        except BrokenProcessPool:
+            # broke before its own callbacks restarted it
+            self._restart_pool(pool)
+            pool = self._pool
+            future = pool.submit(run_job, self.tool, input_pptx, output_pptx)
+        self._futures[job['id']] = future
+        future.add_done_callback(lambda future: self._finished(job, future, pool))
+        return self.get(job['id'])
+
+    def _view(self, job):
+        view = dict(job)
+        future = self._futures.get(job['id'])
+        # the pool does not report when a job starts; a running future is close enough
+        if view['status'] == 'queued' and future is not None and future.running():
+            view['status'] = 'running'
+        return view
+
+    def _finished(self, job, future, pool):
+        try:
+            _, written, error, seconds = future.result()
+        except BrokenProcessPool as e:
+            # a worker died: this job and every other one left in the pool fail
+            written, error, seconds = None, f"worker process died: {e!r}", None
+            self._restart_pool(pool)
+        except Exception as e:
+            written, error, seconds = None, repr(e), None
+        with self._lock:
+            job['status'] = 'done' if error is None else 'failed'
+            job['error'] = error
+            job['seconds'] = seconds
+            self._futures.pop(job['id'], None)
+        if error is None:
+            print(f"✅ {job['input']} -> {written} ({seconds:.2f}s)")
+        else:
+            last_line = error.strip().splitlines()[-1]
+            print(f"❌ {job['input']}: {last_line}", file=sys.stderr)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return self._view(job) if job is not None else None
+
+    def all(self):
+        with self._lock:
+            return [self._view(job) for job in self.jobs.values()]
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def default_token_path():
+    """Per-user token file of the API."""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CONFIG_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "powerpoint-cleaner", "watch_token")
+
+
+def load_token(path=None):
+    """The API token: PPT_CLEANER_WATCH_TOKEN, or the contents of `path`.
+
+    A token file that does not exist yet is created with a random token,
+    readable and writable by the owner only.
+    """
+    token = os.environ.get("PPT_CLEANER_WATCH_TOKEN")
+    if token:
+        return token.strip()
+    path = path or default_token_path()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            token = f.read().strip()
+    except FileNotFoundError:
+        token = None
+    if token:
+        return token
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + '\n')
+    print(f"🔑 API token written to {path}")
+    return token
+
+
+def is_inside(path, dirs):
+    """True if `path` is directly in one of `dirs` (symlinks resolved)."""
+    directory = os.path.dirname(os.path.realpath(path))
+    return any(directory == os.path.realpath(d) for d in dirs)
+
+
+def make_handler(queue, token, dirs):
+    expected = f"Bearer {token}".encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def authorised(self):
+            given = (self.headers.get('Authorization') or '').encode('utf-8')
+            if hmac.compare_digest(given, expected):
+                return True
+            self.send_json(401, {'error': 'missing or wrong API token'})
+            return False
+
+        def send_json(self, status, body):
+            data = json.dumps(body, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if not self.authorised():
+                return
+            parts = self.path.strip('/').split('/')
+            if parts == ['jobs']:
+                self.send_json(200, queue.all())
+            elif len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+                job = queue.get(int(parts[1]))
+                if job is None:
+                    self.send_json(404, {'error': 'no such job'})
+                else:
+                    self.send_json(200, job)
+            else:
+                self.send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if not self.authorised():
+                return
+            if self.path.rstrip('/') != '/jobs':
+                self.send_json(404, {'error': 'not found'})
+                return
+            content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip()
+            if content_type.lower() != 'application/json':
+                self.send_json(415, {'error': 'expected Content-Type: application/json'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY:
+                    raise ValueError(length)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                input_pptx = request['input']
+                if not isinstance(input_pptx, str):
+                    raise TypeError(input_pptx)
+            except (ValueError, KeyError, TypeError):
+                self.send_json(400, {'error': 'expected JSON with an "input" path'})
+                return
+            if not (_is_deck(input_pptx) and is_inside(input_pptx, dirs)):
+                self.send_json(403, {'error': 'only decks in the watched directories can be queued'})
+                return
+            if not os.path.isfile(input_pptx):
+                self.send_json(400, {'error': f'no such file: {input_pptx}'})
+                return
+            self.send_json(202, queue.submit(input_pptx))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(queue, port, token, dirs):
+    """Start the JSON API on 127.0.0.1:`port` in a background thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(queue, token, dirs))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def watch(dirs, queue, settle=DEFAULT_SETTLE, poll=False, stop=None):
+    """Queue every deck that lands in `dirs` until `stop` (an Event) is set."""
+    watcher = open_watcher(dirs, poll)
+    debouncer = Debouncer(settle)
+    queued = {}  # path -> signature it was queued with
+    now = time.monotonic()
+    for path in scan(dirs):
+        if is_up_to_date(path, final_output(queue.tool, path, queue.output_dir)):
+            queued[path] = signature(path)
+        else:
+            debouncer.touch(path, now)
+    try:
+        while stop is None or not stop.is_set():
+            for path in watcher.wait(min(POLL_INTERVAL, settle / 2 or POLL_INTERVAL)):
+                if _is_deck(path) and signature(path) != queued.get(path):
+                    debouncer.touch(path, time.monotonic())
+            for path, sig in debouncer.ready(time.monotonic()):
+                if queued.get(path) == sig:
+                    continue
+                queued[path] = sig
+                job = queue.submit(path)
+                print(f"📥 Job {job['id']}: {path}")
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean decks as they land in watched folders")
+    parser.add_argument("dirs", nargs="+", help="Directories to watch")
+    parser.add_argument("--tool", choices=sorted(TOOLS), default="cleaner",
+                        help="Per-deck tool to run (default: cleaner)")
+    parser.add_argument("--output-dir", help="Write results here instead of next to each input")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="Seconds a file must stay unchanged before it is processed")
+    parser.add_argument("--poll", action="store_true", help="Poll the folders instead of using inotify")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="Port of the local JSON API (0 = no API)")
+    parser.add_argument("--token-file",
+                        help="File holding the API token, created if missing "
+                             "(default: per-user config; PPT_CLEANER_WATCH_TOKEN overrides)")
+    args = parser.parse_args(argv)
+
+    for directory in args.dirs:
+        if not os.path.isdir(directory):
+            parser.error(f"not a directory: {directory}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    queue = JobQueue(args.tool, args.workers, args.output_dir)
+    server = serve(queue, args.port, load_token(args.token_file), args.dirs) if args.port else None
+    print(f"👀 Watching {', '.join(args.dirs)} with '{args.tool}'"
+          + (f"; API on http://127.0.0.1:{args.port}/jobs" if server else ""))
+    try:
+        watch(args.dirs, queue, args.settle, args.poll)
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        if server is not None:
+            server.shutdown()
+        queue.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
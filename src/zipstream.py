@@ -0,0 +1,165 @@
+"""
+zipstream.py
+
+Helpers for rewriting a PPTX (really a ZIP archive) member by member,
+straight from the input archive into the output archive.
+
+Nothing is extracted to disk. Members that are not touched (images, video,
+`_rels`, ...) are copied as raw compressed bytes, so they are never
+decompressed or recompressed. Rewritten members keep their original
+position in the archive and their original compression type.
+"""
+
+import struct
+import zipfile
+import zlib
+
+from instrument import count, stage
+
+# Size of the fixed part of a local file header; the file name and extra
+# field lengths are the two little-endian shorts at its end.
+_LOCAL_HEADER_SIZE = 30
+_COPY_CHUNK = 1024 * 1024
+# Private ZipFile attributes write_raw relies on. Checked against the
+# zipfile module of CPython 3.8 to 3.13; where any is missing, members are
+# decompressed and written through the public API instead.
+_RAW_ATTRIBUTES = ('_lock', '_seekable', '_writecheck', '_didModify', 'start_dir')
+
+
+def clone_info(info):
+    """Return a fresh ZipInfo carrying over the metadata of ``info``."""
+    out = zipfile.ZipInfo(info.filename, info.date_time)
+    out.compress_type = info.compress_type
+    out.comment = info.comment
+    out.create_system = info.create_system
+    out.create_version = info.create_version
+    out.extract_version = info.extract_version
+    out.internal_attr = info.internal_attr
+    out.external_attr = info.external_attr
+    # sizes and CRC go into the local header, so no data descriptor is needed
+    out.flag_bits = info.flag_bits & ~0x08
+    out.CRC = info.CRC
+    out.compress_size = info.compress_size
+    out.file_size = info.file_size
+    return out
+
+
+def _member_data_offset(zin, info):
+    """Offset of the compressed bytes of ``info`` inside the input archive."""
+    zin.fp.seek(info.header_offset)
+    header = zin.fp.read(_LOCAL_HEADER_SIZE)
+    if len(header) != _LOCAL_HEADER_SIZE or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename!r}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    return info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len
+
+
+def write_raw(zout, zinfo, chunks):
+    """Append a member whose compressed bytes are already known.
+
+    ``zinfo`` must carry the final CRC, sizes and compression type, and
+    ``chunks`` must yield exactly ``zinfo.compress_size`` bytes.
+    """
+    if not _raw_access(zout):
+        _write_decompressed(zout, zinfo, chunks)
+        return
+    with zout._lock:
+        if zout._seekable:
+            zout.fp.seek(zout.start_dir)
+        zinfo.header_offset = zout.fp.tell()
+        zout._writecheck(zinfo)
+        zout._didModify = True
+        zout.fp.write(zinfo.FileHeader())
+        for chunk in chunks:
+            zout.fp.write(chunk)
+        zout.filelist.append(zinfo)
+        zout.NameToInfo[zinfo.filename] = zinfo
+        zout.start_dir = zout.fp.tell()
+
+
+def _raw_access(zout):
+    """True when ``zout`` has the zipfile internals write_raw relies on."""
+    return all(hasattr(zout, name) for name in _RAW_ATTRIBUTES)
+
+
+def _write_decompressed(zout, zinfo, chunks):
+    """Fallback for write_raw: decompress the member and let zipfile compress it again."""
+    if zinfo.compress_type == zipfile.ZIP_STORED:
+        data = b''.join(chunks)
+    elif zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        data = b''.join(inflater.decompress(chunk) for chunk in chunks) + inflater.flush()
+    else:
+        raise ValueError(f"Cannot copy {zinfo.filename!r}: compression "
+                                  f"type {zinfo.compress_type} without raw zipfile access")
+    zout.writestr(zinfo, data)
+
+
+def iter_raw(zin, info):
+    """Yield the compressed bytes of ``info`` without decompressing them."""
+    offset = _member_data_offset(zin, info)
+    remaining = info.compress_size
+    while remaining:
+        # re-seek every time: other readers may share the same file object
+        zin.fp.seek(offset)
+        chunk = zin.fp.read(min(_COPY_CHUNK, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {info.filename!r}")
+        offset += len(chunk)
+        remaining -= len(chunk)
+        yield chunk
+
+
+def copy_member(zin, zout, info):
+    """Copy ``info`` from ``zin`` into ``zout`` as raw compressed bytes.
+
+    Without raw zipfile access the member is read and written again, which
+    works for every compression type zipfile can read.
+    """
+    if not _raw_access(zout):
+        zout.writestr(clone_info(info), zin.read(info))
+        return
+    write_raw(zout, clone_info(info), iter_raw(zin, info))
+
+
+def write_member(zout, info, data):
+    """Write new content for ``info``, keeping its name, date and compression."""
+    zout.writestr(clone_info(info), data)
+
+
+def open_member(zout, info):
+    """Open a writable stream for new content of ``info`` (see write_member).
+
+    The content is compressed as it is written, so it never has to be held
+    in memory as a whole.
+    """
+    return zout.open(clone_info(info), 'w')
+
+
+def rewrite_pptx(input_pptx, output_pptx, transform, select=None):
+    """Stream ``input_pptx`` into ``output_pptx``, rewriting selected members.
+
+    ``select(info)`` decides which members are decompressed and handed to
+    ``transform(name, data)`` (all of them when ``select`` is None);
+    everything else is raw-copied. ``transform`` returns the new bytes, or
+    ``None`` to keep the member unchanged (it is then raw-copied as well).
+    Returns the list of rewritten member names.
+    """
+    changed = []
+    with zipfile.ZipFile(input_pptx, 'r') as zin, \
+            zipfile.ZipFile(output_pptx, 'w') as zout:
+        for info in zin.infolist():
+            if select is None or select(info):
+                with stage('read'):
+                    data = zin.read(info)
+                with stage('transform'):
+                    new_data = transform(info.filename, data)
+                count('parts_scanned')
+                if new_data is not None and new_data != data:
+                    with stage('write'):
+                        write_member(zout, info, new_data)
+                    changed.append(info.filename)
+                    continue
+            with stage('copy'):
+                copy_member(zin, zout, info)
+    return changed